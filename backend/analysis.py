@@ -0,0 +1,553 @@
+"""
+Interview performance analysis: assessment areas, per-answer inline scoring,
+Q&A extraction and the aggregated dashboard payload.
+
+The dashboard is map-reduce: each completed session is scored on its own (map, memoized
+in session_scores by the caller) and the per-session area scores are merged with
+recency weighting into the user-level payload (reduce).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from openai import OpenAI
+from dotenv import load_dotenv
+import contextvars
+import os
+import re
+import json
+import hashlib
+
+from profiling import phase, profiled
+import time
+
+load_dotenv()
+
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# Q&A pairs per analysis call; longer sessions are split and the chunks analyzed in parallel
+ANALYSIS_CHUNK_PAIRS = 10
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "8"))
+# Weight of each older session relative to the next newer one when merging area scores
+DASHBOARD_RECENCY_DECAY = float(os.getenv("DASHBOARD_RECENCY_DECAY", "0.85"))
+
+
+TECHNICAL_AREAS = [
+    {
+        "name": "Algorithms / DSA",
+        "keywords": ["algorithm", "data structure", "complexity", "time complexity", "space complexity", "optimization", "o(n)", "binary search", "sorting", "tree", "graph", "dynamic programming"],
+        "recommendation": "Practice 3–4 timed algorithm problems per week focusing on complexity analysis and edge cases."
+    },
+    {
+        "name": "Coding Quality",
+        "keywords": ["code", "coding", "implementation", "syntax", "edge case", "bug", "test case", "clean code", "readable", "modular"],
+        "recommendation": "Write clean, modular code from the start and think through edge cases before coding."
+    },
+    {
+        "name": "System Design",
+        "keywords": ["system design", "scalability", "architecture", "throughput", "latency", "database", "cache", "api", "distributed", "load balancer"],
+        "recommendation": "Solve one system-design prompt weekly and practice discussing trade-offs + scaling strategies."
+    },
+    {
+        "name": "Problem Solving",
+        "keywords": ["approach", "problem solving", "break down", "reasoning", "hypothesis", "strategy", "clarifying questions", "assumptions"],
+        "recommendation": "Spend 5 minutes framing your approach before coding and verify with small test cases."
+    },
+    {
+        "name": "Communication",
+        "keywords": ["communicat", "clarity", "explain", "walk through", "thought process", "articulate", "justify"],
+        "recommendation": "Talk through your thought process clearly: state assumptions, explain approach, and justify decisions."
+    },
+]
+
+BEHAVIORAL_AREAS = [
+    {
+        "name": "STAR Framework",
+        "keywords": ["star", "situation", "task", "action", "result", "specific", "measurable", "example"],
+        "recommendation": "Structure every answer using STAR: Situation → Task → Action → Result with measurable outcomes."
+    },
+    {
+        "name": "Leadership",
+        "keywords": ["leadership", "lead", "mentor", "influence", "initiative", "ownership", "decision", "responsibility"],
+        "recommendation": "Prepare 2–3 stories showing ownership, initiative, and influence without direct authority."
+    },
+    {
+        "name": "Teamwork",
+        "keywords": ["collaboration", "team", "stakeholder", "cross-functional", "communication", "conflict", "feedback"],
+        "recommendation": "Highlight examples of navigating team dynamics, resolving conflicts, and collaborating effectively."
+    },
+    {
+        "name": "Impact",
+        "keywords": ["impact", "results", "improvement", "metrics", "outcome", "value", "measurable", "business"],
+        "recommendation": "Quantify your impact with specific metrics (e.g., '30% faster', 'saved $50K', '10K users')."
+    },
+    {
+        "name": "Problem Solving",
+        "keywords": ["problem", "challenge", "obstacle", "solution", "approach", "overcome", "analytical"],
+        "recommendation": "Show structured problem-solving: how you identified root cause, explored options, and decided."
+    },
+]
+
+MIXED_AREAS = [
+    {
+        "name": "Technical Skills",
+        "keywords": ["algorithm", "code", "system design", "architecture", "complexity", "optimization", "implementation"],
+        "recommendation": "Balance coding practice with system design discussions weekly."
+    },
+    {
+        "name": "Behavioral Skills",
+        "keywords": ["star", "leadership", "collaboration", "impact", "ownership", "conflict", "team"],
+        "recommendation": "Prepare 3–5 STAR stories covering leadership, conflict, and cross-functional collaboration."
+    },
+    {
+        "name": "Communication",
+        "keywords": ["communicat", "clarity", "explain", "articulate", "structure", "justify"],
+        "recommendation": "Practice explaining both technical concepts and behavioral examples clearly and concisely."
+    },
+    {
+        "name": "Problem Solving",
+        "keywords": ["approach", "problem solving", "strategy", "reasoning", "break down", "analytical"],
+        "recommendation": "Demonstrate structured problem-solving in both technical and situational contexts."
+    },
+]
+
+# Bump when the analysis prompt or scoring rules change so stored scores are recomputed
+ANALYSIS_PROMPT_REVISION = 2
+SCORING_VERSION = hashlib.sha1(
+    json.dumps([ANALYSIS_PROMPT_REVISION, TECHNICAL_AREAS, BEHAVIORAL_AREAS, MIXED_AREAS]).encode("utf-8")
+).hexdigest()[:12]
+
+POSITIVE_WORDS = ["strong", "good", "great", "clear", "excellent", "solid", "well", "effective", "confident"]
+NEGATIVE_WORDS = ["improve", "weak", "lacking", "struggle", "unclear", "missed", "incorrect", "incomplete", "needs work"]
+
+
+def area_config_for(interview_type: str) -> list[dict]:
+    if interview_type == "Technical":
+        return TECHNICAL_AREAS
+    if interview_type == "Behavioral":
+        return BEHAVIORAL_AREAS
+    return MIXED_AREAS
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", (text or "").lower()).strip()
+
+
+def _area_score(text: str, keywords: list[str]) -> int:
+    keyword_hits = sum(text.count(k) for k in keywords)
+    positive_hits = sum(text.count(w) for w in POSITIVE_WORDS)
+    negative_hits = sum(text.count(w) for w in NEGATIVE_WORDS)
+    score = 45 + min(keyword_hits, 10) * 4 + min(positive_hits, 8) * 2 - min(negative_hits, 8) * 3
+    return max(20, min(95, score))
+
+
+def build_analysis_prompt(qa_pairs: list[dict], area_config: list[dict]) -> str:
+    """Prompt asking the model to score each covered area from Q&A pairs."""
+    area_names = [cfg["name"] for cfg in area_config]
+    area_descriptions = {cfg["name"]: ", ".join(cfg["keywords"][:5]) for cfg in area_config}
+    
+    # Build analysis prompt (callers keep this to ANALYSIS_CHUNK_PAIRS pairs)
+    qa_text = ""
+    for idx, qa in enumerate(qa_pairs, 1):
+        qa_text += f"\n\nQ{idx}: {qa['question']}\nA{idx}: {qa['answer']}\n"
+        if qa.get('feedback'):
+            qa_text += f"Feedback: {qa['feedback']}\n"
+    
+    analysis_prompt = f"""You are analyzing a technical interview. Below are the questions asked, candidate answers, and interviewer feedback.
+
+Available assessment areas:
+{chr(10).join(f"- {name}: {area_descriptions[name]}" for name in area_names)}
+
+For each area that was ACTUALLY COVERED in the interview questions:
+1. Assign a performance score 0-100 based on answer quality and feedback
+2. Note specific strengths or weaknesses
+
+Respond in this exact JSON format:
+{{
+  "covered_areas": [
+    {{
+      "area": "exact area name",
+      "score": 75,
+      "evidence": "brief explanation of what was tested and how they performed"
+    }}
+  ]
+}}
+
+Only include areas that were actually asked about. If coding wasn't tested, don't include it.
+
+Interview Q&A:
+{qa_text}
+
+JSON Response:"""
+    return analysis_prompt
+
+
+def llm_usage(model: str, response, started: float) -> dict:
+    """Token counts and latency of one chat completion, ready for record_llm_usage."""
+    usage = response.usage
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "model": model,
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "latency_ms": round((time.perf_counter() - started) * 1000),
+    }
+
+
+def chat_completion(profile_phase: str = "openai.chat", **kwargs) -> tuple:
+    """Call the chat model. Returns (response, usage) with usage ready for record_llm_usage."""
+    started = time.perf_counter()
+    with phase(profile_phase):
+        response = client.chat.completions.create(**kwargs)
+    return response, llm_usage(kwargs["model"], response, started)
+
+
+def analyze_qa_pairs_with_ai(qa_pairs: list[dict], area_config: list[dict]) -> tuple:
+    """Use AI to analyze Q&A pairs and determine coverage and performance for each area.
+
+    Returns (analysis, usage); analysis is {} when the call or its JSON failed, and usage
+    is None when no call completed.
+    """
+    if not qa_pairs:
+        return {}, None
+
+    try:
+        response, usage = chat_completion(
+            profile_phase="openai.analysis",
+            model="gpt-4o",
+            messages=[{"role": "user", "content": build_analysis_prompt(qa_pairs, area_config)}],
+            temperature=0.3,
+            max_tokens=800
+        )
+    except Exception as e:
+        print(f"AI analysis error: {e}")
+        return {}, None
+    try:
+        return json.loads(_strip_code_fence(response.choices[0].message.content)), usage
+    except Exception as e:
+        print(f"AI analysis error: {e}")
+        return {}, usage
+
+
+def _strip_code_fence(text: str) -> str:
+    """Extract JSON from markdown code blocks if present."""
+    text = (text or "").strip()
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0].strip()
+    elif "```" in text:
+        text = text.split("```")[1].split("```")[0].strip()
+    return text
+
+
+def build_scoring_instructions(area_config: list[dict]) -> str:
+    """Instructions appended to a chat turn so the interviewer also scores the latest answer."""
+    area_lines = "\n".join(f"- {cfg['name']}: {', '.join(cfg['keywords'][:5])}" for cfg in area_config)
+    return f"""Respond ONLY with a JSON object in this exact format:
+{{
+  "reply": "your message to the candidate (feedback and next question, or the final evaluation)",
+  "scores": [{{"area": "exact area name", "score": 75}}],
+  "done": false
+}}
+
+"scores" rates the candidate's most recent answer (0-100) for each assessment area it actually tested; use an empty list if there was no answer to score.
+Set "done" to true only when this reply is the final overall evaluation and the interview is over.
+
+Available assessment areas:
+{area_lines}"""
+
+
+def parse_scored_reply(raw: str, area_config: list[dict]) -> tuple:
+    """Split a structured turn into (reply_text, metadata). Metadata is None if the turn wasn't valid JSON."""
+    try:
+        data = json.loads(_strip_code_fence(raw))
+        reply = str(data["reply"])
+    except (ValueError, KeyError, TypeError):
+        return raw, None
+
+    valid_areas = {cfg["name"] for cfg in area_config}
+    scores = []
+    for item in data.get("scores") or []:
+        try:
+            area, score = item["area"], int(item["score"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if area in valid_areas:
+            scores.append({"area": area, "score": max(0, min(100, score))})
+    return reply, {"scores": scores, "done": bool(data.get("done", False))}
+
+
+def merge_area_scores(weighted_areas: list[tuple], area_config: list[dict]) -> list[dict]:
+    """Weighted average of [(weight, [{"name", "score"}])] per area, for areas in area_config."""
+    valid_areas = {cfg["name"] for cfg in area_config}
+    totals = {}
+    for weight, areas in weighted_areas:
+        for item in areas:
+            if item.get("name") in valid_areas:
+                total, weight_sum = totals.get(item["name"], (0, 0))
+                totals[item["name"]] = (total + item["score"] * weight, weight_sum + weight)
+    # Keep area_config ordering so the dashboard layout is stable
+    return [
+        {"name": cfg["name"], "score": round(totals[cfg["name"]][0] / totals[cfg["name"]][1])}
+        for cfg in area_config if cfg["name"] in totals and totals[cfg["name"]][1] > 0
+    ]
+
+
+def score_session_inline(session: dict) -> dict:
+    """Average the per-answer scores stored with the session's messages. None if it has none."""
+    area_config = area_config_for(session.get("interview_type"))
+    answers = [
+        (1, [{"name": item.get("area"), "score": item.get("score", 0)} for item in (m.get("metadata") or {}).get("scores", [])])
+        for m in session.get("messages", [])
+    ]
+    areas = merge_area_scores(answers, area_config)
+    if not areas:
+        return None
+    return {
+        "session_id": session["session_id"],
+        "user_id": session["user_id"],
+        "method": "inline",
+        "areas": areas,
+        "qa_count": sum(1 for _, scores in answers if scores),
+    }
+
+
+def score_session_keywords(session: dict) -> dict:
+    """Keyword-heuristic area scores for one session, against its own interview type's areas."""
+    area_config = area_config_for(session.get("interview_type"))
+    corpus = _normalize("\n".join(
+        m.get("content", "") for m in session.get("messages", []) if m.get("role") == "assistant"
+    ))
+    return {
+        "session_id": session["session_id"],
+        "user_id": session["user_id"],
+        "method": "keyword",
+        "areas": [{"name": cfg["name"], "score": _area_score(corpus, cfg["keywords"])} for cfg in area_config],
+        "qa_count": len(extract_qa_pairs([session])),
+    }
+
+
+def parse_analysis_areas(raw: str, area_config: list[dict]) -> list[dict]:
+    """Turn an analysis response into [{"name", "score"}] for known areas. Raises ValueError if unparseable."""
+    return covered_areas(json.loads(_strip_code_fence(raw)), area_config)
+
+
+def covered_areas(analysis: dict, area_config: list[dict]) -> list[dict]:
+    """[{"name", "score"}] for the known areas in a parsed analysis response."""
+    valid_areas = {cfg["name"] for cfg in area_config}
+    areas = []
+    for item in analysis.get("covered_areas", []):
+        try:
+            if item["area"] in valid_areas:
+                areas.append({"name": item["area"], "score": max(0, min(100, int(item["score"])))})
+        except (KeyError, TypeError, ValueError):
+            continue
+    return areas
+
+
+def extract_qa_pairs(sessions: list[dict]) -> list[dict]:
+    """Split session transcripts into question / answer / feedback triples."""
+    qa_pairs = []
+    for session in sessions:
+        messages = session.get("messages", [])
+        current_question = None
+        current_answer = None
+        current_feedback = None
+        
+        for msg in messages:
+            role = msg.get("role", "")
+            content = msg.get("content", "")
+            
+            if role == "assistant":
+                # Check if this is feedback (short) or a new question
+                if current_answer and len(content) < 500:
+                    # Likely feedback for previous answer
+                    current_feedback = content
+                    if current_question and current_answer:
+                        qa_pairs.append({
+                            "question": current_question,
+                            "answer": current_answer,
+                            "feedback": current_feedback
+                        })
+                    current_question = None
+                    current_answer = None
+                    current_feedback = None
+                else:
+                    # New question
+                    if current_question and current_answer:
+                        qa_pairs.append({
+                            "question": current_question,
+                            "answer": current_answer,
+                            "feedback": current_feedback
+                        })
+                    current_question = content
+                    current_answer = None
+                    current_feedback = None
+            elif role == "user":
+                current_answer = content
+        
+        # Add final Q&A if exists
+        if current_question and current_answer:
+            qa_pairs.append({
+                "question": current_question,
+                "answer": current_answer,
+                "feedback": current_feedback
+            })
+    return qa_pairs
+
+
+def chunk_qa_pairs(qa_pairs: list[dict]) -> list[list[dict]]:
+    return [qa_pairs[i:i + ANALYSIS_CHUNK_PAIRS] for i in range(0, len(qa_pairs), ANALYSIS_CHUNK_PAIRS)]
+
+
+def _analyze_chunk(qa_pairs: list[dict], area_config: list[dict]) -> tuple:
+    """(area scores, usage) for one chunk of Q&A pairs; the scores are None if the AI call failed."""
+    analysis, usage = analyze_qa_pairs_with_ai(qa_pairs, area_config)
+    if not isinstance(analysis, dict) or not analysis:
+        return None, usage
+    return covered_areas(analysis, area_config), usage
+
+
+@profiled("score_sessions")
+def score_sessions(sessions: list[dict], usage_log: list = None) -> tuple:
+    """Score each session on its own: inline scores, else AI over all its Q&A pairs, else keywords.
+
+    AI calls for every chunk of every session run in parallel. Returns
+    ({session_id: score}, scores_to_memoize); sessions whose AI pass failed fall back
+    to keywords but are left out of scores_to_memoize so they are retried next time.
+    The usage of each completed AI call, tagged with its user_id and session_id, is
+    appended to usage_log when one is given.
+    """
+    results = {}
+    pending = []
+    for session in sessions:
+        inline = score_session_inline(session)
+        qa_pairs = [] if inline else extract_qa_pairs([session])
+        if inline:
+            results[session["session_id"]] = inline
+        elif not qa_pairs:
+            results[session["session_id"]] = score_session_keywords(session)
+        else:
+            pending.append((session, qa_pairs))
+    memoize = list(results.values())
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=ANALYSIS_CONCURRENCY) as pool:
+            submitted = []
+            for session, qa_pairs in pending:
+                area_config = area_config_for(session.get("interview_type"))
+                chunks = chunk_qa_pairs(qa_pairs)
+                # Copy the context so each call still shows up under the request's profile
+                futures = [
+                    pool.submit(contextvars.copy_context().run, _analyze_chunk, chunk, area_config)
+                    for chunk in chunks
+                ]
+                submitted.append((session, qa_pairs, area_config, chunks, futures))
+            for session, qa_pairs, area_config, chunks, futures in submitted:
+                chunk_areas = []
+                for future in futures:
+                    areas, usage = future.result()
+                    chunk_areas.append(areas)
+                    if usage and usage_log is not None:
+                        usage_log.append({"user_id": session["user_id"], "session_id": session["session_id"], **usage})
+                if any(areas is None for areas in chunk_areas):
+                    results[session["session_id"]] = score_session_keywords(session)
+                    continue
+                areas = merge_area_scores(
+                    [(len(chunk), areas) for chunk, areas in zip(chunks, chunk_areas)], area_config
+                )
+                score = {
+                    "session_id": session["session_id"],
+                    "user_id": session["user_id"],
+                    "method": "ai",
+                    "areas": areas,
+                    "qa_count": len(qa_pairs),
+                }
+                results[session["session_id"]] = score
+                memoize.append(score)
+    return results, memoize
+
+
+@profiled("build_dashboard_payload")
+def build_dashboard_payload(completed_sessions: list[dict], session_scores: dict = None) -> dict:
+    """Aggregate recent completed sessions (newest first) into area scores, strengths and recommendations.
+
+    session_scores maps session_id to that session's scores (see score_sessions); when
+    omitted, every session is scored here. Newer sessions weigh more in the merge.
+    """
+    if not completed_sessions:
+        return {
+            "has_data": False,
+            "areas": [],
+            "strengths": [],
+            "improvements": [],
+            "recommendations": [],
+            "summary": "Complete an interview to unlock personalized review and recommendations.",
+            "source_sessions": 0,
+            "interview_context": "Mixed"
+        }
+
+    # Detect most common interview type from recent completed sessions
+    type_counts = {}
+    for session in completed_sessions:
+        itype = session.get("interview_type", "Mixed")
+        type_counts[itype] = type_counts.get(itype, 0) + 1
+    
+    dominant_type = max(type_counts.items(), key=lambda x: x[1])[0] if type_counts else "Mixed"
+    
+    # Select area config based on interview type
+    area_config = area_config_for(dominant_type)
+
+    if session_scores is None:
+        session_scores, _ = score_sessions(completed_sessions)
+    areas = merge_area_scores([
+        (DASHBOARD_RECENCY_DECAY ** rank, session_scores[session["session_id"]]["areas"])
+        for rank, session in enumerate(completed_sessions) if session["session_id"] in session_scores
+    ], area_config)
+
+    if not areas:
+        return {
+            "has_data": False,
+            "areas": [],
+            "strengths": [],
+            "improvements": [],
+            "recommendations": [],
+            "summary": "Not enough data to analyze. Complete more interview questions.",
+            "source_sessions": len(completed_sessions),
+            "interview_context": dominant_type
+        }
+    
+    ranked = sorted(areas, key=lambda a: a["score"], reverse=True)
+    
+    top_areas = ranked[:min(2, len(ranked))]
+    low_areas = list(reversed(ranked[-min(2, len(ranked)):]))
+    
+    # Get recommendations for low-scoring areas
+    rec_map = {cfg["name"]: cfg["recommendation"] for cfg in area_config}
+    recommendations = []
+    for a in low_areas:
+        if a["name"] in rec_map:
+            recommendations.append(rec_map[a["name"]])
+    
+    strengths = [f"{a['name']} ({a['score']}/100)" for a in top_areas]
+    improvements = [f"{a['name']} ({a['score']}/100)" for a in low_areas]
+    
+    interview_label = f"{dominant_type} interview" if dominant_type != "Mixed" else "interviews"
+    
+    if top_areas and low_areas:
+        summary = (
+            f"Based on your last {len(completed_sessions)} completed {interview_label}"
+            f"{'s' if len(completed_sessions) > 1 else ''}, your strongest area is {top_areas[0]['name']}. "
+            f"Focus next on {low_areas[0]['name']} to improve performance."
+        )
+    else:
+        summary = f"Analysis based on {len(completed_sessions)} completed {interview_label}{'s' if len(completed_sessions) > 1 else ''}."
+
+    return {
+        "has_data": True,
+        "areas": areas,
+        "strengths": strengths,
+        "improvements": improvements,
+        "recommendations": recommendations,
+        "summary": summary,
+        "source_sessions": len(completed_sessions),
+        "interview_context": dominant_type
+    }
@@ -0,0 +1,69 @@
+"""
+Scheduled refresh of the operator analytics rollups (analytics_daily).
+
+Each pass folds only the events since the last watermark into the per-day rollups,
+so /admin/analytics reads a small, bounded table instead of grouping over
+interview_sessions and chat_messages while live traffic is running.
+
+Runs inside the API process by default (ANALYTICS_WORKER_ENABLED=1), or standalone:
+    python analytics_worker.py
+
+Configuration:
+    ANALYTICS_REFRESH_SECONDS   wait between refresh passes (default 300)
+    ANALYTICS_SETTLE_SECONDS    events newer than this are left for the next pass (default 120)
+    ANALYTICS_MAX_WINDOW_DAYS   largest window folded in one transaction, e.g. during backfill (default 7)
+"""
+
+from datetime import timedelta
+import os
+import threading
+
+from dotenv import load_dotenv
+
+from sharding import open_database, shard_databases
+
+ANALYTICS_REFRESH_SECONDS = float(os.getenv("ANALYTICS_REFRESH_SECONDS", "300"))
+ANALYTICS_SETTLE_SECONDS = float(os.getenv("ANALYTICS_SETTLE_SECONDS", "120"))
+ANALYTICS_MAX_WINDOW_DAYS = int(os.getenv("ANALYTICS_MAX_WINDOW_DAYS", "7"))
+
+
+def refresh_analytics(db, stop_event: threading.Event = None) -> int:
+    """Bring every shard's rollups up to date. Returns the number of windows folded in."""
+    windows = 0
+    for shard_db in shard_databases(db):
+        while stop_event is None or not stop_event.is_set():
+            window = shard_db.refresh_analytics(ANALYTICS_SETTLE_SECONDS, ANALYTICS_MAX_WINDOW_DAYS)
+            if window is None:
+                break
+            windows += 1
+            # A full-size window means we're still backfilling; otherwise this shard is caught up
+            if window[1] - window[0] < timedelta(days=ANALYTICS_MAX_WINDOW_DAYS):
+                break
+            print(f"Analytics backfilled {window[0].isoformat()} to {window[1].isoformat()}")
+    return windows
+
+
+def run_analytics_worker(db, stop_event: threading.Event):
+    """Refresh on a fixed interval until stop_event is set."""
+    while not stop_event.is_set():
+        try:
+            refresh_analytics(db, stop_event)
+        except Exception as e:
+            print(f"Analytics worker error: {e}")
+        stop_event.wait(ANALYTICS_REFRESH_SECONDS)
+
+
+def start_analytics_worker(db) -> threading.Event:
+    """Run the worker on a daemon thread. Set the returned event to stop it."""
+    stop_event = threading.Event()
+    threading.Thread(target=run_analytics_worker, args=(db, stop_event), daemon=True).start()
+    return stop_event
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    db = open_database()
+    try:
+        run_analytics_worker(db, threading.Event())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,51 @@
+"""
+Move transcripts of old sessions (finished, or abandoned in progress) into the compressed archive tier.
+
+Usage:
+    python archive_transcripts.py [--older-than-days 180] [--batch-size 100] [--vacuum]
+
+Meant to run on a schedule (e.g. nightly cron). Each batch is its own transaction,
+so the job can be stopped at any point and simply re-run. Archived sessions stay
+readable through the API; they are decompressed on access. They no longer appear in
+/history/search results.
+"""
+
+import argparse
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from database import ARCHIVE_AFTER_DAYS
+from sharding import open_database, shard_databases
+
+
+def _mb(num_bytes: int) -> str:
+    return f"{num_bytes / (1024 * 1024):.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old interview transcripts.")
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the hot message tables afterwards")
+    args = parser.parse_args()
+
+    for shard, shard_db in enumerate(shard_databases(open_database())):
+        started = time.perf_counter()
+        sessions = raw_total = compressed_total = 0
+        while True:
+            examined, raw, compressed = shard_db.archive_old_sessions(args.older_than_days, args.batch_size)
+            if not examined:
+                break
+            sessions, raw_total, compressed_total = sessions + examined, raw_total + raw, compressed_total + compressed
+            print(f"[shard {shard}] archived {sessions} sessions ({_mb(raw_total)} -> {_mb(compressed_total)})")
+        if args.vacuum:
+            shard_db.vacuum_message_tables()
+        sizes = ", ".join(f"{table} {_mb(size)}" for table, size in shard_db.get_storage_sizes().items())
+        print(f"[shard {shard}] done in {time.perf_counter() - started:.1f}s: {sizes}")
+
+
+if __name__ == "__main__":
+    main()
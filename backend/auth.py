@@ -0,0 +1,114 @@
+"""
+JWT issuing and verification with an in-memory fast path that still honors revocation.
+
+Each user has a token_version in the database, bumped on password change, username
+change and account deletion. Tokens carry the version they were issued with; a token
+is rejected once the user's current version is higher. Verified tokens are kept in a
+bounded LRU, and version changes are pulled from the database on a short interval,
+so verifying a request is a memory lookup.
+"""
+
+from collections import OrderedDict
+import datetime
+import os
+import threading
+import time
+
+import jwt
+
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+TOKEN_SYNC_SECONDS = float(os.getenv("TOKEN_SYNC_SECONDS", "5"))
+TOKEN_LIFETIME = datetime.timedelta(days=7)
+SYNC_OVERLAP = datetime.timedelta(seconds=30)
+
+
+class AuthError(Exception):
+    """Raised when a token is missing, invalid, expired or revoked."""
+
+
+class TokenAuth:
+    def __init__(self, db, secret_key: str, cache_size: int = AUTH_CACHE_SIZE):
+        self.db = db
+        self.secret_key = secret_key
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._verified = OrderedDict()  # token -> decoded payload, most recently used last
+        self._versions = {}  # user_id -> current token_version (only users that ever bumped)
+        self._disabled = set()
+        self._synced_until = None
+
+    def issue(self, user_id: int, username: str, token_version: int = 0) -> str:
+        payload = {
+            "user_id": user_id,
+            "username": username,
+            "ver": token_version,
+            "exp": datetime.datetime.now(datetime.timezone.utc) + TOKEN_LIFETIME
+        }
+        return jwt.encode(payload, self.secret_key, algorithm="HS256")
+
+    def verify(self, token: str) -> dict:
+        """Return the token's payload, or raise AuthError."""
+        with self._lock:
+            payload = self._verified.get(token)
+            if payload is not None:
+                self._verified.move_to_end(token)
+        if payload is None:
+            try:
+                payload = jwt.decode(token, self.secret_key, algorithms=["HS256"])
+            except jwt.ExpiredSignatureError:
+                raise AuthError("Token expired")
+            except jwt.InvalidTokenError:
+                raise AuthError("Invalid token")
+            with self._lock:
+                self._verified[token] = payload
+                while len(self._verified) > self.cache_size:
+                    self._verified.popitem(last=False)
+        elif payload["exp"] < time.time():
+            with self._lock:
+                self._verified.pop(token, None)
+            raise AuthError("Token expired")
+
+        user_id = payload.get("user_id")
+        if user_id in self._disabled or payload.get("ver", 0) < self._versions.get(user_id, 0):
+            raise AuthError("Token revoked")
+        return payload
+
+    def note_version(self, user_id: int, token_version: int):
+        """Apply a version change made by this process immediately, ahead of the next sync."""
+        with self._lock:
+            if token_version > self._versions.get(user_id, 0):
+                self._versions[user_id] = token_version
+
+    def disable_user(self, user_id: int):
+        """Reject every token for a deleted account, ahead of the next sync."""
+        with self._lock:
+            self._disabled.add(user_id)
+
+    def sync(self):
+        """Pull token version changes made since the last sync (by any process)."""
+        # Overlap the window so a bump committed just after a later-stamped one isn't missed
+        since = self._synced_until - SYNC_OVERLAP if self._synced_until else None
+        rows = self.db.get_token_versions_since(since)
+        with self._lock:
+            for row in rows:
+                user_id = row["user_id"]
+                if row["token_version"] > self._versions.get(user_id, 0):
+                    self._versions[user_id] = row["token_version"]
+                if row["disabled"]:
+                    self._disabled.add(user_id)
+                if self._synced_until is None or row["token_version_updated_at"] > self._synced_until:
+                    self._synced_until = row["token_version_updated_at"]
+
+    def _sync_loop(self, stop_event: threading.Event):
+        while not stop_event.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"Token revocation sync error: {e}")
+            stop_event.wait(TOKEN_SYNC_SECONDS)
+
+    def start_sync(self) -> threading.Event:
+        """Sync on a daemon thread every TOKEN_SYNC_SECONDS. Set the returned event to stop it."""
+        stop_event = threading.Event()
+        threading.Thread(target=self._sync_loop, args=(stop_event,), daemon=True).start()
+        return stop_event
@@ -0,0 +1,72 @@
+"""
+Benchmark message append and read latency for the two chat message storage layouts.
+
+Usage:
+    python bench_transcripts.py [--sessions 30] [--messages 20]
+
+Creates a throwaway user in DATABASE_URL, fills the same sessions/messages through
+each layout, prints latency percentiles, then deletes the user and its data.
+"""
+
+import argparse
+import secrets
+import statistics
+import time
+
+from dotenv import load_dotenv
+from database import InterviewDatabase
+
+load_dotenv()
+
+
+def _percentiles(samples: list[float]) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"p50 {statistics.median(ordered) * 1000:7.2f} ms   p95 {p95 * 1000:7.2f} ms   n={len(ordered)}"
+
+
+def bench_layout(layout: str, num_sessions: int, num_messages: int) -> dict:
+    db = InterviewDatabase(message_layout=layout)
+    user_id, _, _ = db.create_user(f"bench_{layout}_{secrets.token_hex(4)}", secrets.token_hex(8))
+    results = {"append": [], "read_session": [], "read_dashboard": []}
+    try:
+        session_ids = []
+        for _ in range(num_sessions):
+            session_id = db.create_session(user_id, "Technical", "Mid Level", num_messages // 2)
+            session_ids.append(session_id)
+            for i in range(num_messages):
+                role = "assistant" if i % 2 == 0 else "user"
+                content = f"{role} message {i} " + "lorem ipsum dolor sit amet " * 40
+                started = time.perf_counter()
+                db.save_message(session_id, role, content)
+                results["append"].append(time.perf_counter() - started)
+            db.update_session_status(session_id, "completed")
+
+        for session_id in session_ids:
+            started = time.perf_counter()
+            db.get_session_details(session_id)
+            results["read_session"].append(time.perf_counter() - started)
+        for _ in range(10):
+            started = time.perf_counter()
+            db.get_completed_sessions_with_messages(user_id, limit=num_sessions)
+            results["read_dashboard"].append(time.perf_counter() - started)
+    finally:
+        db.purge_user(user_id)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chat message storage layouts.")
+    parser.add_argument("--sessions", type=int, default=30)
+    parser.add_argument("--messages", type=int, default=20, help="Messages per session")
+    args = parser.parse_args()
+
+    for layout in ("rows", "transcript"):
+        results = bench_layout(layout, args.sessions, args.messages)
+        print(f"\n[{layout}]")
+        for name, samples in results.items():
+            print(f"  {name:<15} {_percentiles(samples)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,25 +4,316 @@ Uses PostgreSQL for scalable, cloud-based database storage with UTC timestamps.
 """
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.errors
+from psycopg2.extras import RealDictCursor, Json, execute_values
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime, timezone
 from typing import List, Dict, Optional
+import copy
 import hashlib
 import secrets
+import json
 import os
+import threading
+import time
+import zlib
 
+from profiling import profile_methods, profiled
+from resume_utils import (
+    normalize_text, content_hash, MAX_RESUME_CHARS
+)
+
+# Chat message storage layouts: one row per message, or one appendable JSONB
+# transcript per session (split into chunks once a chunk reaches its size cap)
+MESSAGE_LAYOUTS = ("rows", "transcript")
+TRANSCRIPT_CHUNK_MAX_BYTES = int(os.getenv("TRANSCRIPT_CHUNK_MAX_BYTES", str(256 * 1024)))
+TRANSCRIPT_CHUNK_MAX_MESSAGES = int(os.getenv("TRANSCRIPT_CHUNK_MAX_MESSAGES", "200"))
+
+# Transcripts of sessions finished (or, if never finished, started) longer ago than this move to the archive tier
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+
+# Read replicas: how long to avoid a failed replica, the replication lag we tolerate
+# (WAL bytes not yet replayed), and how long a user's reads stay on the primary after they write
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+REPLICA_MAX_LAG_BYTES = int(os.getenv("REPLICA_MAX_LAG_BYTES", str(16 * 1024 * 1024)))
+REPLICA_HEALTH_INTERVAL = float(os.getenv("REPLICA_HEALTH_INTERVAL", "15"))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# Set per request when the client reports a write within READ_YOUR_WRITES_SECONDS (on any
+# process), so that request's reads go to the primary
+client_wrote_recently: ContextVar[bool] = ContextVar("client_wrote_recently", default=False)
+
+# Response/request header carrying the client's last write time (epoch seconds)
+WRITE_MARKER_HEADER = "X-Last-Write"
+
+
+class ReadYourWritesMiddleware:
+    """Hand clients the time of their last write and route their reads to the primary shortly after.
+
+    Successful non-GET responses carry WRITE_MARKER_HEADER; the client echoes it on later
+    requests, so read-your-writes holds whichever process serves them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        marker = dict(scope["headers"]).get(WRITE_MARKER_HEADER.lower().encode(), b"")
+        try:
+            since_write = time.time() - float(marker)
+        except ValueError:
+            since_write = None
+        writes = scope["method"] not in ("GET", "HEAD", "OPTIONS")
+
+        async def send_wrapper(message):
+            if writes and message["type"] == "http.response.start" and message["status"] < 400:
+                # Units of work commit inside the handler, so the write is visible by now
+                message["headers"] = list(message.get("headers", [])) + [
+                    (WRITE_MARKER_HEADER.lower().encode(), f"{time.time():.3f}".encode())
+                ]
+            await send(message)
+
+        token = client_wrote_recently.set(since_write is not None and 0 <= since_write < READ_YOUR_WRITES_SECONDS)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            client_wrote_recently.reset(token)
+
+
+class SearchUnavailableError(Exception):
+    """Raised by search_messages before migrate_schema.py has added the search column."""
+
+
+class _UnitConnection:
+    """The one connection shared by every step of a unit of work (opened on first use).
+
+    Steps' commit() and close() are deferred to the unit; a step's rollback() dooms it.
+    """
+
+    def __init__(self, connect):
+        self._connect = connect
+        self._conn = None
+        self.failed = False
+
+    @property
+    def opened(self) -> bool:
+        return self._conn is not None
+
+    def _get(self):
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def cursor(self, *args, **kwargs):
+        return self._get().cursor(*args, **kwargs)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def rollback(self):
+        # Roll back now so later steps can still run; the unit itself will not commit
+        if self._conn is not None:
+            self._conn.rollback()
+        self.failed = True
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def finish(self):
+        if self._conn is None:
+            return
+        try:
+            if self.failed:
+                self._conn.rollback()
+                raise RuntimeError("A step of this unit of work failed; all of its writes were rolled back")
+            self._conn.commit()
+        finally:
+            self._conn.close()
+
+    def abort(self):
+        if self._conn is None:
+            return
+        try:
+            self._conn.rollback()
+        finally:
+            self._conn.close()
+
+
+class _ReplicaState:
+    """Replica routing state, shared by a database and the unit-of-work views copied from it."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.down_until: Dict[str, float] = {}
+        self.turn = 0
+        # ("user", id) / ("session", id) -> monotonic time of the last write (per process)
+        self.recent_writes: Dict[tuple, float] = {}
+
+
+def _timestamp_value(value) -> datetime:
+    """Comparable UTC datetime for a message timestamp stored as a datetime or ISO string."""
+    if value is None:
+        return datetime.min.replace(tzinfo=timezone.utc)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _message_key(entry: Dict) -> tuple:
+    return entry.get('role'), entry.get('content'), _timestamp_value(entry.get('timestamp'))
+
+
+def _merge_messages(*sources: List[Dict]) -> List[Dict]:
+    """Union of one session's messages from several layouts, without duplicates, in timestamp order."""
+    merged, seen = [], set()
+    for entries in sources:
+        for entry in entries:
+            key = _message_key(entry)
+            if key not in seen:
+                seen.add(key)
+                merged.append(entry)
+    merged.sort(key=lambda entry: _timestamp_value(entry.get('timestamp')))
+    return merged
+
+
+@profile_methods("db")
 class InterviewDatabase:
-    def __init__(self, database_url: str = None):
+    def __init__(self, database_url: str = None, message_layout: str = None, replica_urls: List[str] = None):
         """Initialize database connection and create tables if they don't exist."""
         self.database_url = database_url or os.getenv("DATABASE_URL")
         if not self.database_url:
             raise ValueError("DATABASE_URL environment variable is not set. Please add it to your .env file.")
+        self.message_layout = message_layout or os.getenv("MESSAGE_LAYOUT", "rows")
+        if self.message_layout not in MESSAGE_LAYOUTS:
+            raise ValueError(f"MESSAGE_LAYOUT must be one of {', '.join(MESSAGE_LAYOUTS)}")
+        if replica_urls is None:
+            replica_urls = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+        self.replica_urls = replica_urls
+        self._replicas = _ReplicaState()
+        self._unit = None
         self.init_database()
+        if self.replica_urls:
+            threading.Thread(target=self._replica_health_loop, daemon=True).start()
 
     def get_connection(self):
-        """Create and return a database connection."""
+        """Create and return a database connection (the shared one inside a unit of work)."""
+        if self._unit is not None:
+            return self._unit
         return psycopg2.connect(self.database_url)
 
+    @contextmanager
+    def unit_of_work(self):
+        """Run several operations on one connection and transaction, committed once at the end.
+
+        Yields a view of this database whose methods share the connection; it is rolled
+        back instead if the block raises or any step rolled back.
+        """
+        unit = copy.copy(self)
+        unit._unit = _UnitConnection(self.get_connection)
+        try:
+            yield unit
+        except BaseException:
+            unit._unit.abort()
+            raise
+        unit._unit.finish()
+
+    # ─── Read Replicas ─────────────────────────────────────────────────────
+
+    def get_read_connection(self, user_id: int = None, session_id: int = None):
+        """Connection for a read-only query: a healthy replica, or the primary.
+
+        Reads go to the primary when no replica is available, or when the client
+        (client_wrote_recently) or this process wrote within READ_YOUR_WRITES_SECONDS.
+        Inside a unit of work that has already used the primary, reads join its transaction.
+        """
+        if self._unit is not None and self._unit.opened:
+            return self._unit
+        if not self.replica_urls or client_wrote_recently.get() or self._wrote_recently(user_id, session_id):
+            return self.get_connection()
+        now = time.monotonic()
+        state = self._replicas
+        with state.lock:
+            start = state.turn = (state.turn + 1) % len(self.replica_urls)
+        for offset in range(len(self.replica_urls)):
+            url = self.replica_urls[(start + offset) % len(self.replica_urls)]
+            if state.down_until.get(url, 0) > now:
+                continue
+            try:
+                return psycopg2.connect(url, connect_timeout=3)
+            except psycopg2.OperationalError as e:
+                print(f"Replica unavailable, failing over: {e}")
+                state.down_until[url] = now + REPLICA_RETRY_SECONDS
+        return self.get_connection()
+
+    def _mark_write(self, user_id: int = None, session_id: int = None):
+        if not self.replica_urls:
+            return
+        now = time.monotonic()
+        recent_writes = self._replicas.recent_writes
+        with self._replicas.lock:
+            if user_id is not None:
+                recent_writes[("user", user_id)] = now
+            if session_id is not None:
+                recent_writes[("session", session_id)] = now
+            if len(recent_writes) > 10000:
+                cutoff = now - READ_YOUR_WRITES_SECONDS
+                for key in [k for k, t in recent_writes.items() if t <= cutoff]:
+                    del recent_writes[key]
+
+    def _wrote_recently(self, user_id: int = None, session_id: int = None) -> bool:
+        cutoff = time.monotonic() - READ_YOUR_WRITES_SECONDS
+        recent_writes = self._replicas.recent_writes
+        return (recent_writes.get(("user", user_id), 0) > cutoff
+                or recent_writes.get(("session", session_id), 0) > cutoff)
+
+    def check_replicas(self) -> Dict[str, Optional[int]]:
+        """Probe each replica's replication lag; unreachable or lagging replicas are taken out of rotation.
+
+        Lag is the WAL the replica has yet to replay up to the primary's current position,
+        which (unlike the age of the last replayed transaction) stays at zero while the
+        primary is idle. Returns {url: lag_bytes or None if unreachable}.
+        """
+        conn = psycopg2.connect(self.database_url)
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_current_wal_lsn()")
+        primary_lsn = cursor.fetchone()[0]
+        cursor.close()
+        conn.close()
+        status = {}
+        for url in self.replica_urls:
+            try:
+                conn = psycopg2.connect(url, connect_timeout=3)
+                cursor = conn.cursor()
+                # NULL on a server that is not a standby
+                cursor.execute("SELECT pg_wal_lsn_diff(%s::pg_lsn, pg_last_wal_replay_lsn())", (primary_lsn,))
+                lag = cursor.fetchone()[0]
+                lag = max(0, int(lag)) if lag is not None else None
+                cursor.close()
+                conn.close()
+            except psycopg2.Error:
+                lag = None
+            status[url] = lag
+            if lag is None or lag > REPLICA_MAX_LAG_BYTES:
+                self._replicas.down_until[url] = time.monotonic() + REPLICA_RETRY_SECONDS
+            else:
+                self._replicas.down_until.pop(url, None)
+        return status
+
+    def _replica_health_loop(self):
+        while True:
+            try:
+                self.check_replicas()
+            except Exception as e:
+                print(f"Replica health check error: {e}")
+            time.sleep(REPLICA_HEALTH_INTERVAL)
+
     def init_database(self):
         """Create database tables if they don't exist."""
         conn = self.get_connection()
@@ -33,7 +324,27 @@ class InterviewDatabase:
                 username TEXT UNIQUE NOT NULL,
                 password_hash TEXT,
                 salt TEXT,
-                created_at TIMESTAMP WITH TIME ZONE DEFAULT (NOW() AT TIME ZONE 'UTC')
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT (NOW() AT TIME ZONE 'UTC'),
+                disabled_at TIMESTAMP WITH TIME ZONE
+            )
+        """)
+        cursor.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS disabled_at TIMESTAMP WITH TIME ZONE")
+        # Bumped whenever issued tokens must stop working (password/username change, deletion)
+        cursor.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0")
+        cursor.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS token_version_updated_at TIMESTAMP WITH TIME ZONE")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_users_token_version_updated ON users(token_version_updated_at) "
+            "WHERE token_version_updated_at IS NOT NULL"
+        )
+        # Account deletions are purged in the background; a job survives restarts until done
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS deletion_jobs (
+                user_id INTEGER PRIMARY KEY,
+                status TEXT NOT NULL DEFAULT 'pending',
+                rows_deleted BIGINT NOT NULL DEFAULT 0,
+                requested_at TIMESTAMP WITH TIME ZONE DEFAULT (NOW() AT TIME ZONE 'UTC'),
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT (NOW() AT TIME ZONE 'UTC'),
+                completed_at TIMESTAMP WITH TIME ZONE
             )
         """)
         cursor.execute("""
@@ -56,6 +367,23 @@ class InterviewDatabase:
                 role TEXT NOT NULL,
                 content TEXT NOT NULL,
                 timestamp TIMESTAMP WITH TIME ZONE DEFAULT (NOW() AT TIME ZONE 'UTC'),
+                metadata JSONB,
+                FOREIGN KEY (session_id) REFERENCES interview_sessions(session_id)
+            )
+        """)
+        # Older databases were created before per-message metadata existed
+        cursor.execute("ALTER TABLE chat_messages ADD COLUMN IF NOT EXISTS metadata JSONB")
+        # Per-session message reads use idx_chat_messages_session, built by `python migrate_schema.py messages`
+        # Full-text search (search_vector and its index) is added by `python migrate_schema.py search`,
+        # which backfills in batches instead of rewriting chat_messages under a lock at startup
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS session_transcripts (
+                session_id INTEGER NOT NULL,
+                chunk_no INTEGER NOT NULL,
+                messages JSONB NOT NULL DEFAULT '[]'::jsonb,
+                message_count INTEGER NOT NULL DEFAULT 0,
+                byte_size INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (session_id, chunk_no),
                 FOREIGN KEY (session_id) REFERENCES interview_sessions(session_id)
             )
         """)
@@ -66,15 +394,85 @@ class InterviewDatabase:
                 filename TEXT NOT NULL,
                 content TEXT NOT NULL,
                 uploaded_at TIMESTAMP WITH TIME ZONE DEFAULT (NOW() AT TIME ZONE 'UTC'),
+                content_hash TEXT,
                 FOREIGN KEY (user_id) REFERENCES users(user_id)
             )
         """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS archived_transcripts (
+                session_id INTEGER PRIMARY KEY,
+                message_count INTEGER NOT NULL,
+                raw_bytes INTEGER NOT NULL,
+                compressed BYTEA NOT NULL,
+                archived_at TIMESTAMP WITH TIME ZONE DEFAULT (NOW() AT TIME ZONE 'UTC'),
+                FOREIGN KEY (session_id) REFERENCES interview_sessions(session_id)
+            )
+        """)
+        # Blobs are already zlib-compressed; don't let TOAST try again
+        cursor.execute("ALTER TABLE archived_transcripts ALTER COLUMN compressed SET STORAGE EXTERNAL")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS session_scores (
+                session_id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                scoring_version TEXT NOT NULL,
+                method TEXT NOT NULL,
+                areas JSONB NOT NULL,
+                qa_count INTEGER NOT NULL DEFAULT 0,
+                scored_at TIMESTAMP WITH TIME ZONE DEFAULT (NOW() AT TIME ZONE 'UTC'),
+                FOREIGN KEY (session_id) REFERENCES interview_sessions(session_id)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_session_scores_user ON session_scores (user_id)")
+        # One row per LLM call: token counts (including provider prefix-cache hits) and latency
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS llm_usage (
+                usage_id BIGSERIAL PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                session_id INTEGER,
+                purpose TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                cached_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                latency_ms INTEGER NOT NULL,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT (NOW() AT TIME ZONE 'UTC')
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_created ON llm_usage (created_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_user ON llm_usage (user_id)")
+        # Operator analytics: per-day rollups refreshed incrementally up to a watermark
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS analytics_daily (
+                day DATE NOT NULL,
+                interview_type TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                sessions_started INTEGER NOT NULL DEFAULT 0,
+                sessions_completed INTEGER NOT NULL DEFAULT 0,
+                sessions_abandoned INTEGER NOT NULL DEFAULT 0,
+                turns INTEGER NOT NULL DEFAULT 0,
+                llm_calls INTEGER NOT NULL DEFAULT 0,
+                llm_latency_ms BIGINT NOT NULL DEFAULT 0,
+                prompt_tokens BIGINT NOT NULL DEFAULT 0,
+                cached_tokens BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, interview_type, difficulty)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS analytics_state (
+                name TEXT PRIMARY KEY,
+                refreshed_through TIMESTAMP WITH TIME ZONE NOT NULL
+            )
+        """)
+        # The refresh windows' range-scan indexes are built by `python migrate_schema.py analytics`
+        cursor.execute("ALTER TABLE resumes ADD COLUMN IF NOT EXISTS content_hash TEXT")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_resumes_user_hash ON resumes (user_id, content_hash)")
         conn.commit()
         cursor.close()
         conn.close()
 
     # ─── User Management ───────────────────────────────────────────────────
 
+    @profiled("hash_password")
     def _hash_password(self, password: str, salt: str = None) -> tuple:
         """Hash password with salt. Returns (hash, salt)."""
         if salt is None:
@@ -84,8 +482,11 @@ class InterviewDatabase:
         ).hex()
         return password_hash, salt
 
-    def create_user(self, username: str, password: str) -> tuple:
-        """Create a new user. Returns (user_id, success, message)."""
+    def create_user(self, username: str, password: str, user_id: int = None) -> tuple:
+        """Create a new user. Returns (user_id, success, message).
+
+        user_id is only passed when IDs are allocated elsewhere (see sharding.py).
+        """
         conn = self.get_connection()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         try:
@@ -102,10 +503,11 @@ class InterviewDatabase:
                     return existing_user['user_id'], True, "Password set successfully for existing account"
                 return None, False, "Username already exists"
             password_hash, salt = self._hash_password(password)
-            cursor.execute(
-                "INSERT INTO users (username, password_hash, salt) VALUES (%s, %s, %s) RETURNING user_id",
-                (username, password_hash, salt)
-            )
+            cursor.execute("""
+                INSERT INTO users (user_id, username, password_hash, salt)
+                VALUES (COALESCE(%s, nextval(pg_get_serial_sequence('users', 'user_id'))), %s, %s, %s)
+                RETURNING user_id
+            """, (user_id, username, password_hash, salt))
             user_id = cursor.fetchone()['user_id']
             conn.commit()
             return user_id, True, "User created successfully"
@@ -119,12 +521,16 @@ class InterviewDatabase:
         """Authenticate user. Returns (user_id, success, message)."""
         conn = self.get_connection()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("SELECT user_id, password_hash, salt FROM users WHERE username = %s", (username,))
+        cursor.execute(
+            "SELECT user_id, password_hash, salt, disabled_at FROM users WHERE username = %s", (username,)
+        )
         result = cursor.fetchone()
         cursor.close()
         conn.close()
         if not result:
             return None, False, "Username not found"
+        if result['disabled_at'] is not None:
+            return None, False, "This account has been deleted"
         if result['password_hash'] is None or result['salt'] is None:
             return None, False, "Account needs password setup. Please use Sign Up."
         password_hash, _ = self._hash_password(password, result['salt'])
@@ -142,11 +548,52 @@ class InterviewDatabase:
         conn.close()
         return result['user_id'] if result else None
 
+    # ─── Token Versions ────────────────────────────────────────────────────
+
+    BUMP_TOKEN_VERSION = "token_version = token_version + 1, token_version_updated_at = clock_timestamp()"
+
+    def get_token_version(self, user_id: int) -> int:
+        """Current token version for a user (0 if never bumped or user not found)."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT token_version FROM users WHERE user_id = %s", (user_id,))
+        result = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        return result[0] if result else 0
+
+    def get_token_versions_since(self, since=None) -> List[Dict]:
+        """Users whose token version changed at or after `since` (all bumped users if None).
+
+        Purged accounts no longer have a users row; their completed deletion job stands in
+        as a tombstone (disabled, stamped with the purge time), so processes that had not
+        synced the deletion yet, or start later, still reject the account's tokens.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute("""
+            SELECT user_id, token_version, disabled_at IS NOT NULL AS disabled, token_version_updated_at
+            FROM users
+            WHERE token_version_updated_at IS NOT NULL
+              AND (%s::timestamptz IS NULL OR token_version_updated_at >= %s::timestamptz)
+            UNION ALL
+            SELECT j.user_id, 0, TRUE, j.completed_at
+            FROM deletion_jobs j
+            WHERE j.status = 'completed'
+              AND (%s::timestamptz IS NULL OR j.completed_at >= %s::timestamptz)
+              AND NOT EXISTS (SELECT 1 FROM users u WHERE u.user_id = j.user_id)
+            ORDER BY token_version_updated_at
+        """, (since, since, since, since))
+        results = [dict(row) for row in cursor.fetchall()]
+        cursor.close()
+        conn.close()
+        return results
+
     # ─── Profile Management ────────────────────────────────────────────────
 
     def get_user_profile(self, user_id: int) -> Optional[Dict]:
         """Get user profile info."""
-        conn = self.get_connection()
+        conn = self.get_read_connection(user_id=user_id)
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         cursor.execute(
             "SELECT user_id, username, created_at FROM users WHERE user_id = %s", (user_id,)
@@ -164,8 +611,12 @@ class InterviewDatabase:
             cursor.execute("SELECT user_id FROM users WHERE username = %s", (new_username,))
             if cursor.fetchone():
                 return False, "Username already taken"
-            cursor.execute("UPDATE users SET username = %s WHERE user_id = %s", (new_username, user_id))
+            cursor.execute(
+                f"UPDATE users SET username = %s, {self.BUMP_TOKEN_VERSION} WHERE user_id = %s",
+                (new_username, user_id)
+            )
             conn.commit()
+            self._mark_write(user_id=user_id)
             return True, "Username updated successfully"
         except Exception as e:
             return False, str(e)
@@ -177,45 +628,200 @@ class InterviewDatabase:
         """Update password after verifying current. Returns (success, message)."""
         conn = self.get_connection()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("SELECT password_hash, salt FROM users WHERE user_id = %s", (user_id,))
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        if not result:
-            return False, "User not found"
-        current_hash, _ = self._hash_password(current_password, result['salt'])
-        if current_hash != result['password_hash']:
-            return False, "Current password is incorrect"
-        new_hash, new_salt = self._hash_password(new_password)
+        try:
+            cursor.execute("SELECT password_hash, salt FROM users WHERE user_id = %s", (user_id,))
+            result = cursor.fetchone()
+            if not result:
+                return False, "User not found"
+            current_hash, _ = self._hash_password(current_password, result['salt'])
+            if current_hash != result['password_hash']:
+                return False, "Current password is incorrect"
+            new_hash, new_salt = self._hash_password(new_password)
+            cursor.execute(
+                f"UPDATE users SET password_hash = %s, salt = %s, {self.BUMP_TOKEN_VERSION} WHERE user_id = %s",
+                (new_hash, new_salt, user_id)
+            )
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+        self._mark_write(user_id=user_id)
+        return True, "Password updated successfully"
+
+    def delete_user(self, user_id: int) -> tuple:
+        """Disable the account and queue its data for background purging. Returns (success, message)."""
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE users SET password_hash = %s, salt = %s WHERE user_id = %s",
-            (new_hash, new_salt, user_id)
-        )
+        try:
+            cursor.execute(
+                f"UPDATE users SET disabled_at = NOW() AT TIME ZONE 'UTC', {self.BUMP_TOKEN_VERSION} "
+                "WHERE user_id = %s AND disabled_at IS NULL",
+                (user_id,)
+            )
+            if cursor.rowcount == 0:
+                return False, "User not found"
+            cursor.execute(
+                "INSERT INTO deletion_jobs (user_id) VALUES (%s) ON CONFLICT (user_id) DO NOTHING", (user_id,)
+            )
+            conn.commit()
+            self._mark_write(user_id=user_id)
+            return True, "Account deleted successfully"
+        except Exception as e:
+            conn.rollback()
+            return False, str(e)
+        finally:
+            cursor.close()
+            conn.close()
+
+    # ─── Background Account Purge ──────────────────────────────────────────
+
+    # Children before parents; the users row goes last and marks the purge complete.
+    # Completed deletion_jobs rows are the revocation tombstones (see get_token_versions_since)
+    PURGE_ORDER = [
+        ("chat_messages", "session_id IN (SELECT session_id FROM interview_sessions WHERE user_id = %s)"),
+        ("session_transcripts", "session_id IN (SELECT session_id FROM interview_sessions WHERE user_id = %s)"),
+        ("archived_transcripts", "session_id IN (SELECT session_id FROM interview_sessions WHERE user_id = %s)"),
+        ("session_scores", "user_id = %s"),
+        ("llm_usage", "user_id = %s"),
+        ("interview_sessions", "user_id = %s"),
+        ("resumes", "user_id = %s"),
+        ("users", "user_id = %s"),
+    ]
+
+    def claim_deletion_job(self, stale_after_seconds: int = 300) -> Optional[int]:
+        """Claim the oldest pending deletion (or one whose worker stopped heartbeating). Returns user_id."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE deletion_jobs SET status = 'running', updated_at = NOW() AT TIME ZONE 'UTC'
+            WHERE user_id = (
+                SELECT user_id FROM deletion_jobs
+                WHERE status = 'pending'
+                   OR (status = 'running' AND updated_at < NOW() - make_interval(secs => %s))
+                ORDER BY requested_at
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING user_id
+        """, (stale_after_seconds,))
+        row = cursor.fetchone()
         conn.commit()
         cursor.close()
         conn.close()
-        return True, "Password updated successfully"
+        return row[0] if row else None
 
-    def delete_user(self, user_id: int) -> tuple:
-        """Delete user and all associated data. Returns (success, message)."""
+    def purge_user_batch(self, user_id: int, batch_size: int = 500) -> tuple:
+        """Delete at most batch_size of a user's rows in one short transaction.
+
+        Returns (rows_deleted, done). Safe to call again after a crash; the
+        deletion job row (if any) records progress and completion.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         try:
+            deleted, done = 0, False
+            for table, where in self.PURGE_ORDER:
+                cursor.execute(f"""
+                    DELETE FROM {table}
+                    WHERE ctid = ANY(ARRAY(SELECT ctid FROM {table} WHERE {where} LIMIT %s))
+                """, (user_id, batch_size))
+                deleted = cursor.rowcount
+                if deleted:
+                    done = table == "users"
+                    break
+            else:
+                done = True
             cursor.execute("""
-                DELETE FROM chat_messages WHERE session_id IN (
-                    SELECT session_id FROM interview_sessions WHERE user_id = %s
-                )
-            """, (user_id,))
-            cursor.execute("DELETE FROM interview_sessions WHERE user_id = %s", (user_id,))
-            cursor.execute("DELETE FROM resumes WHERE user_id = %s", (user_id,))
-            cursor.execute("DELETE FROM users WHERE user_id = %s", (user_id,))
+                UPDATE deletion_jobs
+                SET rows_deleted = rows_deleted + %s,
+                    updated_at = NOW() AT TIME ZONE 'UTC',
+                    status = CASE WHEN %s THEN 'completed' ELSE status END,
+                    -- Same clock as token_version_updated_at: both feed the token sync watermark
+                    completed_at = CASE WHEN %s THEN clock_timestamp() ELSE completed_at END
+                WHERE user_id = %s
+            """, (deleted, done, done, user_id))
             conn.commit()
-            return True, "Account deleted successfully"
-        except Exception as e:
+            return deleted, done
+        except Exception:
             conn.rollback()
-            return False, str(e)
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    def purge_user(self, user_id: int, batch_size: int = 500) -> int:
+        """Purge all of a user's rows now, in batches. Returns rows deleted."""
+        total, done = 0, False
+        while not done:
+            deleted, done = self.purge_user_batch(user_id, batch_size)
+            total += deleted
+        return total
+
+    def get_deletion_jobs(self, limit: int = 50) -> List[Dict]:
+        """Most recent deletion jobs with their progress."""
+        conn = self.get_connection()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute("""
+            SELECT user_id, status, rows_deleted, requested_at, updated_at, completed_at
+            FROM deletion_jobs
+            ORDER BY requested_at DESC
+            LIMIT %s
+        """, (limit,))
+        jobs = [dict(row) for row in cursor.fetchall()]
+        cursor.close()
+        conn.close()
+        return jobs
+
+    # ─── Bulk Export / Import (shard moves) ────────────────────────────────
+
+    # (table, filter, columns that the target regenerates)
+    USER_DATA_TABLES = [
+        ("users", "user_id = %s", ()),
+        ("interview_sessions", "user_id = %s", ()),
+        ("chat_messages",
+         "session_id IN (SELECT session_id FROM interview_sessions WHERE user_id = %s)",
+         ("message_id", "search_vector")),
+        ("session_transcripts",
+         "session_id IN (SELECT session_id FROM interview_sessions WHERE user_id = %s)", ()),
+        ("archived_transcripts",
+         "session_id IN (SELECT session_id FROM interview_sessions WHERE user_id = %s)", ()),
+        ("session_scores", "user_id = %s", ()),
+        ("llm_usage", "user_id = %s", ("usage_id",)),
+        ("resumes", "user_id = %s", ("resume_id",)),
+    ]
+
+    def export_user_data(self, user_id: int) -> Dict[str, List[Dict]]:
+        """Read every row belonging to a user, keyed by table name, in dependency order."""
+        conn = self.get_connection()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        data = {}
+        for table, where, skip in self.USER_DATA_TABLES:
+            order = "message_id" if table == "chat_messages" else "1"
+            cursor.execute(f"SELECT * FROM {table} WHERE {where} ORDER BY {order}", (user_id,))
+            data[table] = [
+                {k: v for k, v in row.items() if k not in skip} for row in cursor.fetchall()
+            ]
+        cursor.close()
+        conn.close()
+        return data
+
+    def import_user_data(self, data: Dict[str, List[Dict]]):
+        """Insert rows produced by export_user_data in a single transaction."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            for table, _, _ in self.USER_DATA_TABLES:
+                for row in data.get(table, []):
+                    columns = list(row)
+                    values = [Json(v) if isinstance(v, (dict, list)) else v for v in row.values()]
+                    cursor.execute(
+                        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+                        values
+                    )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
         finally:
             cursor.close()
             conn.close()
@@ -223,38 +829,47 @@ class InterviewDatabase:
     # ─── Interview Session Management ──────────────────────────────────────
 
     def create_session(self, user_id: int, interview_type: str,
-                       difficulty: str, num_questions: int) -> int:
+                       difficulty: str, num_questions: int, session_id: int = None) -> int:
         """Create a new interview session and return session_id."""
         conn = self.get_connection()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         cursor.execute("""
             INSERT INTO interview_sessions
-            (user_id, interview_type, difficulty, num_questions)
-            VALUES (%s, %s, %s, %s)
+            (session_id, user_id, interview_type, difficulty, num_questions)
+            VALUES (COALESCE(%s, nextval(pg_get_serial_sequence('interview_sessions', 'session_id'))),
+                    %s, %s, %s, %s)
             RETURNING session_id
-        """, (user_id, interview_type, difficulty, num_questions))
+        """, (session_id, user_id, interview_type, difficulty, num_questions))
         session_id = cursor.fetchone()['session_id']
         conn.commit()
         cursor.close()
         conn.close()
+        self._mark_write(user_id=user_id, session_id=session_id)
         return session_id
 
     def update_session_status(self, session_id: int, status: str):
         """Update session status (in_progress, completed, abandoned)."""
         conn = self.get_connection()
         cursor = conn.cursor()
+        # Re-sending the same status keeps the original time (analytics counts it once)
         cursor.execute("""
             UPDATE interview_sessions
-            SET status = %s, completed_at = NOW() AT TIME ZONE 'UTC'
+            SET completed_at = CASE WHEN status = %s AND completed_at IS NOT NULL
+                                    THEN completed_at ELSE NOW() AT TIME ZONE 'UTC' END,
+                status = %s
             WHERE session_id = %s
-        """, (status, session_id))
+            RETURNING user_id
+        """, (status, status, session_id))
+        row = cursor.fetchone()
         conn.commit()
         cursor.close()
         conn.close()
+        # A just-completed session must show up on the user's dashboard right away
+        self._mark_write(user_id=row[0] if row else None, session_id=session_id)
 
     def get_user_sessions(self, user_id: int, limit: int = 10) -> List[Dict]:
         """Get recent interview sessions for a user."""
-        conn = self.get_connection()
+        conn = self.get_read_connection(user_id=user_id)
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         cursor.execute("""
             SELECT session_id, interview_type, difficulty,
@@ -271,36 +886,109 @@ class InterviewDatabase:
 
     # ─── Chat Message Management ───────────────────────────────────────────
 
-    def save_message(self, session_id: int, role: str, content: str):
-        """Save a chat message to the database."""
+    def save_message(self, session_id: int, role: str, content: str, metadata: Dict = None):
+        """Save a chat message to the database, with optional structured metadata (e.g. inline scores)."""
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO chat_messages (session_id, role, content)
-            VALUES (%s, %s, %s)
-        """, (session_id, role, content))
+        if self.message_layout == "transcript":
+            self._append_transcript(cursor, session_id, [{
+                "role": role,
+                "content": content,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "metadata": metadata,
+            }])
+        else:
+            cursor.execute("""
+                INSERT INTO chat_messages (session_id, role, content, metadata)
+                VALUES (%s, %s, %s, %s)
+            """, (session_id, role, content, Json(metadata) if metadata is not None else None))
         conn.commit()
         cursor.close()
         conn.close()
+        self._mark_write(session_id=session_id)
+
+    def _append_transcript(self, cursor, session_id: int, entries: List[Dict]):
+        """Append entries to the session's latest transcript chunk, spilling into new chunks at the cap."""
+        for entry in entries:
+            payload = json.dumps([entry], default=str)
+            size = len(payload.encode("utf-8"))
+            cursor.execute("""
+                UPDATE session_transcripts
+                SET messages = messages || %s::jsonb,
+                    message_count = message_count + 1,
+                    byte_size = byte_size + %s
+                WHERE session_id = %s
+                  AND chunk_no = (SELECT MAX(chunk_no) FROM session_transcripts WHERE session_id = %s)
+                  AND byte_size + %s <= %s
+                  AND message_count < %s
+            """, (payload, size, session_id, session_id, size,
+                  TRANSCRIPT_CHUNK_MAX_BYTES, TRANSCRIPT_CHUNK_MAX_MESSAGES))
+            if cursor.rowcount == 0:
+                # No chunk yet, or the latest one is full
+                cursor.execute("""
+                    INSERT INTO session_transcripts (session_id, chunk_no, messages, message_count, byte_size)
+                    SELECT %s, COALESCE(MAX(chunk_no) + 1, 0), %s::jsonb, 1, %s
+                    FROM session_transcripts WHERE session_id = %s
+                """, (session_id, payload, size, session_id))
+
+    def _load_messages(self, cursor, session_ids: List[int]) -> Dict[int, List[Dict]]:
+        """Fetch messages for several sessions in one pass. Returns {session_id: [messages]}.
+
+        A session can have messages in both layouts (turns written after MESSAGE_LAYOUT
+        changed, before it was converted) and in the archive (messages written after it
+        was archived), so all three are read and merged.
+        """
+        messages = {session_id: [] for session_id in session_ids}
+        if not session_ids:
+            return messages
+        pending = list(session_ids)
+        transcripts = {session_id: [] for session_id in pending}
+        cursor.execute("""
+            SELECT session_id, messages
+            FROM session_transcripts
+            WHERE session_id = ANY(%s)
+            ORDER BY session_id, chunk_no
+        """, (pending,))
+        for row in cursor.fetchall():
+            transcripts[row['session_id']].extend(row['messages'])
+        rows = {session_id: [] for session_id in pending}
+        cursor.execute("""
+            SELECT session_id, message_id, role, content, timestamp, metadata
+            FROM chat_messages
+            WHERE session_id = ANY(%s)
+            ORDER BY session_id, timestamp ASC, message_id ASC
+        """, (pending,))
+        for row in cursor.fetchall():
+            message = dict(row)
+            rows[message.pop('session_id')].append(message)
+        # Archived sessions are only decompressed when actually requested
+        archived = {}
+        cursor.execute(
+            "SELECT session_id, compressed FROM archived_transcripts WHERE session_id = ANY(%s)", (pending,)
+        )
+        for row in cursor.fetchall():
+            archived[row['session_id']] = json.loads(zlib.decompress(bytes(row['compressed'])))
+        for session_id in pending:
+            sources = [source for source in (archived.get(session_id), transcripts[session_id], rows[session_id])
+                       if source]
+            if len(sources) > 1:
+                messages[session_id] = _merge_messages(*sources)
+            elif sources:
+                messages[session_id] = sources[0]
+        return messages
 
     def get_session_messages(self, session_id: int) -> List[Dict]:
         """Get all messages for a specific session."""
-        conn = self.get_connection()
+        conn = self.get_read_connection(session_id=session_id)
         cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("""
-            SELECT message_id, role, content, timestamp
-            FROM chat_messages
-            WHERE session_id = %s
-            ORDER BY timestamp ASC
-        """, (session_id,))
-        messages = [dict(row) for row in cursor.fetchall()]
+        messages = self._load_messages(cursor, [session_id])[session_id]
         cursor.close()
         conn.close()
         return messages
 
     def get_session_details(self, session_id: int) -> Optional[Dict]:
         """Get complete session details including all messages."""
-        conn = self.get_connection()
+        conn = self.get_read_connection(session_id=session_id)
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         cursor.execute("""
             SELECT s.session_id, s.interview_type, s.difficulty,
@@ -316,22 +1004,261 @@ class InterviewDatabase:
             conn.close()
             return None
         session_dict = dict(session)
-        cursor.execute("""
-            SELECT role, content, timestamp
-            FROM chat_messages
-            WHERE session_id = %s
-            ORDER BY timestamp ASC
-        """, (session_id,))
-        session_dict['messages'] = [dict(row) for row in cursor.fetchall()]
+        session_dict['messages'] = self._load_messages(cursor, [session_id])[session_id]
         cursor.close()
         conn.close()
         return session_dict
 
+    def convert_sessions_layout(self, target_layout: str, after_session_id: int = 0,
+                                batch_size: int = 100, delete_source: bool = False) -> tuple:
+        """Copy one batch of sessions into target_layout, in session_id order.
+
+        Messages already present in the target layout are not copied again, so the
+        conversion can be re-run after an interruption. Sessions with messages in both
+        layouts (turns written after MESSAGE_LAYOUT was switched) are merged in
+        timestamp order. Returns (last_session_id, converted_count); last_session_id is
+        None once there is nothing left to convert.
+        """
+        if target_layout not in MESSAGE_LAYOUTS:
+            raise ValueError(f"target_layout must be one of {', '.join(MESSAGE_LAYOUTS)}")
+        conn = self.get_connection()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cursor.execute("""
+                SELECT session_id FROM interview_sessions
+                WHERE session_id > %s
+                ORDER BY session_id
+                LIMIT %s
+            """, (after_session_id, batch_size))
+            session_ids = [row['session_id'] for row in cursor.fetchall()]
+            if not session_ids:
+                return None, 0
+
+            transcripts = {}
+            cursor.execute("""
+                SELECT session_id, messages FROM session_transcripts
+                WHERE session_id = ANY(%s)
+                ORDER BY session_id, chunk_no
+            """, (session_ids,))
+            for row in cursor.fetchall():
+                transcripts.setdefault(row['session_id'], []).extend(row['messages'])
+            rows = {}
+            cursor.execute("""
+                SELECT session_id, role, content, timestamp, metadata
+                FROM chat_messages
+                WHERE session_id = ANY(%s)
+                ORDER BY session_id, timestamp ASC, message_id ASC
+            """, (session_ids,))
+            for row in cursor.fetchall():
+                entry = dict(row)
+                entry['timestamp'] = entry['timestamp'].isoformat() if entry['timestamp'] else None
+                rows.setdefault(entry.pop('session_id'), []).append(entry)
+            source, target = (rows, transcripts) if target_layout == "transcript" else (transcripts, rows)
+
+            converted = 0
+            for sid, entries in source.items():
+                existing = {_message_key(entry) for entry in target.get(sid, [])}
+                missing = [entry for entry in entries if _message_key(entry) not in existing]
+                if not missing:
+                    continue
+                converted += 1
+                if target_layout == "rows":
+                    for entry in missing:
+                        metadata = entry.get('metadata')
+                        cursor.execute("""
+                            INSERT INTO chat_messages (session_id, role, content, timestamp, metadata)
+                            VALUES (%s, %s, %s, %s, %s)
+                        """, (sid, entry['role'], entry['content'], entry.get('timestamp'),
+                              Json(metadata) if metadata is not None else None))
+                elif sid in target:
+                    # Transcript order is append order, so rebuild it with the old turns in place
+                    cursor.execute("DELETE FROM session_transcripts WHERE session_id = %s", (sid,))
+                    self._append_transcript(cursor, sid, _merge_messages(target[sid], missing))
+                else:
+                    self._append_transcript(cursor, sid, missing)
+            if delete_source and source:
+                # Every source message is now in the target layout
+                table = "chat_messages" if target_layout == "transcript" else "session_transcripts"
+                cursor.execute(f"DELETE FROM {table} WHERE session_id = ANY(%s)", (list(source),))
+            conn.commit()
+            return session_ids[-1], converted
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    # ─── Transcript Archival ───────────────────────────────────────────────
+
+    def archive_old_sessions(self, older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = 100) -> tuple:
+        """Move one batch of old sessions' messages into compressed archive blobs.
+
+        Sessions still 'in_progress' past the cutoff (the tab was simply closed) are
+        archived too. Messages leave chat_messages / session_transcripts in the same
+        transaction that writes the blob; anything written to the session afterwards is
+        merged with the archive on read. Archived sessions are no longer found by
+        search_messages.
+        Returns (sessions_examined, raw_bytes, compressed_bytes); 0 sessions means nothing is left.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cursor.execute("""
+                SELECT s.session_id FROM interview_sessions s
+                WHERE COALESCE(s.completed_at, s.started_at) < NOW() - make_interval(days => %s)
+                  AND NOT EXISTS (SELECT 1 FROM archived_transcripts a WHERE a.session_id = s.session_id)
+                ORDER BY s.session_id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (older_than_days, batch_size))
+            session_ids = [row['session_id'] for row in cursor.fetchall()]
+            messages = self._load_messages(cursor, session_ids)
+            archived, raw_total, compressed_total = [], 0, 0
+            for session_id, session_messages in messages.items():
+                # Row timestamps are datetimes; store them in the transcript layout's ISO format
+                session_messages = [
+                    {**message, 'timestamp': message['timestamp'].isoformat()}
+                    if isinstance(message.get('timestamp'), datetime) else message
+                    for message in session_messages
+                ]
+                # Store even empty transcripts so the session isn't picked up again
+                raw = json.dumps(session_messages).encode("utf-8")
+                compressed = zlib.compress(raw, 9)
+                cursor.execute("""
+                    INSERT INTO archived_transcripts (session_id, message_count, raw_bytes, compressed)
+                    VALUES (%s, %s, %s, %s)
+                """, (session_id, len(session_messages), len(raw), psycopg2.Binary(compressed)))
+                archived.append(session_id)
+                raw_total += len(raw)
+                compressed_total += len(compressed)
+            if archived:
+                cursor.execute("DELETE FROM chat_messages WHERE session_id = ANY(%s)", (archived,))
+                cursor.execute("DELETE FROM session_transcripts WHERE session_id = ANY(%s)", (archived,))
+            conn.commit()
+            return len(session_ids), raw_total, compressed_total
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    def get_storage_sizes(self) -> Dict[str, int]:
+        """Total on-disk bytes (table + indexes + TOAST) of each message tier."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        sizes = {}
+        for table in ("chat_messages", "session_transcripts", "archived_transcripts"):
+            cursor.execute("SELECT pg_total_relation_size(%s)", (table,))
+            sizes[table] = cursor.fetchone()[0]
+        cursor.close()
+        conn.close()
+        return sizes
+
+    def vacuum_message_tables(self):
+        """Reclaim space left by archived rows in the hot tables."""
+        conn = self.get_connection()
+        conn.autocommit = True
+        cursor = conn.cursor()
+        for table in ("chat_messages", "session_transcripts"):
+            cursor.execute(f"VACUUM (ANALYZE) {table}")
+        cursor.close()
+        conn.close()
+
+    # ─── Online Migrations ─────────────────────────────────────────────────
+
+    def create_index_concurrently(self, name: str, definition: str):
+        """CREATE INDEX CONCURRENTLY, replacing an invalid index left by an interrupted build.
+
+        definition is the part after the index name, e.g. "ON chat_messages (timestamp)".
+        """
+        conn = self.get_connection()
+        conn.autocommit = True  # CONCURRENTLY cannot run inside a transaction
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT i.indisvalid FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+            """, (name,))
+            row = cursor.fetchone()
+            if row and row[0]:
+                return
+            if row:
+                cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            cursor.execute(f"CREATE INDEX CONCURRENTLY {name} {definition}")
+        finally:
+            cursor.close()
+            conn.close()
+
+    def prepare_search_vector(self):
+        """Add chat_messages.search_vector without rewriting the table, kept current by a trigger."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            # A nullable column without a default is a catalog-only change
+            cursor.execute("ALTER TABLE chat_messages ADD COLUMN IF NOT EXISTS search_vector tsvector")
+            cursor.execute("""
+                CREATE OR REPLACE FUNCTION chat_messages_search_vector() RETURNS trigger AS $$
+                BEGIN
+                    NEW.search_vector := to_tsvector('english', NEW.content);
+                    RETURN NEW;
+                END
+                $$ LANGUAGE plpgsql
+            """)
+            cursor.execute("DROP TRIGGER IF EXISTS chat_messages_search_vector ON chat_messages")
+            cursor.execute("""
+                CREATE TRIGGER chat_messages_search_vector
+                BEFORE INSERT OR UPDATE OF content ON chat_messages
+                FOR EACH ROW EXECUTE FUNCTION chat_messages_search_vector()
+            """)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    def backfill_search_vector(self, after_message_id: int = 0, batch_size: int = 5000) -> tuple:
+        """Fill search_vector for one batch of older messages, in message_id order.
+
+        Returns (last_message_id, updated_count); last_message_id is None once done.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT MAX(message_id) FROM (
+                    SELECT message_id FROM chat_messages
+                    WHERE message_id > %s
+                    ORDER BY message_id
+                    LIMIT %s
+                ) batch
+            """, (after_message_id, batch_size))
+            last_id = cursor.fetchone()[0]
+            if last_id is None:
+                return None, 0
+            cursor.execute("""
+                UPDATE chat_messages SET search_vector = to_tsvector('english', content)
+                WHERE message_id > %s AND message_id <= %s AND search_vector IS NULL
+            """, (after_message_id, last_id))
+            updated = cursor.rowcount
+            conn.commit()
+            return last_id, updated
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
     # ─── Statistics and Analytics ──────────────────────────────────────────
 
     def get_user_stats(self, user_id: int) -> Dict:
         """Get statistics for a user's interview history."""
-        conn = self.get_connection()
+        conn = self.get_read_connection(user_id=user_id)
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         cursor.execute("""
             SELECT COUNT(*) as total_sessions,
@@ -352,7 +1279,7 @@ class InterviewDatabase:
 
     def get_completed_sessions_with_messages(self, user_id: int, limit: int = 30) -> List[Dict]:
         """Get completed sessions with messages for dashboard analytics."""
-        conn = self.get_connection()
+        conn = self.get_read_connection(user_id=user_id)
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         cursor.execute("""
             SELECT session_id, interview_type, difficulty, started_at, completed_at
@@ -363,33 +1290,364 @@ class InterviewDatabase:
         """, (user_id, limit))
         sessions = [dict(row) for row in cursor.fetchall()]
 
+        messages = self._load_messages(cursor, [session["session_id"] for session in sessions])
         for session in sessions:
-            cursor.execute("""
-                SELECT role, content, timestamp
-                FROM chat_messages
-                WHERE session_id = %s
-                ORDER BY timestamp ASC
-            """, (session["session_id"],))
-            session["messages"] = [dict(row) for row in cursor.fetchall()]
+            session["messages"] = messages[session["session_id"]]
 
         cursor.close()
         conn.close()
         return sessions
 
+    def get_completed_sessions(self, user_id: int, limit: int = 30) -> List[Dict]:
+        """Most recent completed sessions, newest first, without their messages."""
+        conn = self.get_read_connection(user_id=user_id)
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute("""
+            SELECT session_id, user_id, interview_type, difficulty, started_at, completed_at
+            FROM interview_sessions
+            WHERE user_id = %s AND status = 'completed'
+            ORDER BY completed_at DESC NULLS LAST, started_at DESC
+            LIMIT %s
+        """, (user_id, limit))
+        sessions = [dict(row) for row in cursor.fetchall()]
+        cursor.close()
+        conn.close()
+        return sessions
+
+    def get_sessions_messages(self, user_id: int, session_ids: List[int]) -> Dict[int, List[Dict]]:
+        """Messages for several of a user's sessions. Returns {session_id: [messages]}."""
+        conn = self.get_read_connection(user_id=user_id)
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute(
+            "SELECT session_id FROM interview_sessions WHERE user_id = %s AND session_id = ANY(%s)",
+            (user_id, list(session_ids))
+        )
+        owned = [row['session_id'] for row in cursor.fetchall()]
+        messages = self._load_messages(cursor, owned)
+        cursor.close()
+        conn.close()
+        return messages
+
+    # ─── Stored Session Scores ─────────────────────────────────────────────
+
+    def iter_completed_sessions(self, after_session_id: int = 0, batch_size: int = 200,
+                                skip_scoring_version: str = None):
+        """Yield batches of completed sessions (with messages) in session_id order.
+
+        Streams through a server-side cursor on a read connection so the whole
+        table is never held in memory. Sessions already scored with
+        skip_scoring_version are left out.
+        """
+        conn = self.get_read_connection()
+        stream = conn.cursor(name="completed_sessions_stream", cursor_factory=RealDictCursor)
+        stream.itersize = batch_size
+        lookup = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            stream.execute("""
+                SELECT s.session_id, s.user_id, s.interview_type, s.difficulty, s.started_at, s.completed_at
+                FROM interview_sessions s
+                WHERE s.status = 'completed' AND s.session_id > %s
+                  AND NOT EXISTS (
+                      SELECT 1 FROM session_scores sc
+                      WHERE sc.session_id = s.session_id AND sc.scoring_version = %s
+                  )
+                ORDER BY s.session_id
+            """, (after_session_id, skip_scoring_version or ""))
+            while True:
+                sessions = [dict(row) for row in stream.fetchmany(batch_size)]
+                if not sessions:
+                    break
+                messages = self._load_messages(lookup, [session["session_id"] for session in sessions])
+                for session in sessions:
+                    session["messages"] = messages[session["session_id"]]
+                yield sessions
+        finally:
+            lookup.close()
+            stream.close()
+            conn.close()
+
+    def save_session_scores(self, scores: List[Dict], scoring_version: str):
+        """Upsert per-session area scores in one round trip.
+
+        A keyword score never replaces an inline or AI score at the same scoring_version.
+        """
+        if not scores:
+            return
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        execute_values(cursor, """
+            INSERT INTO session_scores (session_id, user_id, scoring_version, method, areas, qa_count)
+            VALUES %s
+            ON CONFLICT (session_id) DO UPDATE SET
+                scoring_version = EXCLUDED.scoring_version,
+                method = EXCLUDED.method,
+                areas = EXCLUDED.areas,
+                qa_count = EXCLUDED.qa_count,
+                scored_at = NOW() AT TIME ZONE 'UTC'
+            WHERE session_scores.scoring_version <> EXCLUDED.scoring_version
+               OR EXCLUDED.method <> 'keyword'
+               OR session_scores.method = 'keyword'
+        """, [
+            (row["session_id"], row["user_id"], scoring_version, row["method"], Json(row["areas"]), row["qa_count"])
+            for row in scores
+        ])
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+    def get_session_scores(self, user_id: int, session_ids: List[int], scoring_version: str) -> Dict[int, Dict]:
+        """Stored scores for the given sessions at scoring_version. Returns {session_id: row}."""
+        if not session_ids:
+            return {}
+        conn = self.get_read_connection(user_id=user_id)
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute("""
+            SELECT session_id, method, areas, qa_count, scored_at
+            FROM session_scores
+            WHERE user_id = %s AND session_id = ANY(%s) AND scoring_version = %s
+        """, (user_id, list(session_ids), scoring_version))
+        scores = {row['session_id']: dict(row) for row in cursor.fetchall()}
+        cursor.close()
+        conn.close()
+        return scores
+
+    # ─── LLM Usage ─────────────────────────────────────────────────────────
+
+    def record_llm_usage(self, user_id: int, session_id: Optional[int], purpose: str, model: str,
+                         prompt_tokens: int, cached_tokens: int, completion_tokens: int, latency_ms: int):
+        """Store the token counts and latency of one LLM call."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO llm_usage
+                (user_id, session_id, purpose, model, prompt_tokens, cached_tokens, completion_tokens, latency_ms)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, (user_id, session_id, purpose, model, prompt_tokens, cached_tokens, completion_tokens, latency_ms))
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+    def record_llm_usage_batch(self, purpose: str, rows: List[Dict]):
+        """Store many LLM calls of one purpose in one round trip (rows as from analysis.llm_usage, plus user_id and session_id)."""
+        if not rows:
+            return
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        execute_values(cursor, """
+            INSERT INTO llm_usage
+                (user_id, session_id, purpose, model, prompt_tokens, cached_tokens, completion_tokens, latency_ms)
+            VALUES %s
+        """, [
+            (row["user_id"], row["session_id"], purpose, row["model"], row["prompt_tokens"],
+             row["cached_tokens"], row["completion_tokens"], row["latency_ms"])
+            for row in rows
+        ])
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+    def get_llm_usage_summary(self, hours: int = 24) -> List[Dict]:
+        """Token and latency totals per (purpose, model) over the last `hours`."""
+        conn = self.get_read_connection()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute("""
+            SELECT purpose, model, COUNT(*) AS calls,
+                   SUM(prompt_tokens) AS prompt_tokens, SUM(cached_tokens) AS cached_tokens,
+                   SUM(completion_tokens) AS completion_tokens, SUM(latency_ms) AS latency_ms
+            FROM llm_usage
+            WHERE created_at >= NOW() - make_interval(hours => %s)
+            GROUP BY purpose, model
+            ORDER BY purpose, model
+        """, (hours,))
+        results = [dict(row) for row in cursor.fetchall()]
+        cursor.close()
+        conn.close()
+        return results
+
+    # ─── Operator Analytics ────────────────────────────────────────────────
+
+    # Every event in the window, attributed to the day it happened and its session's type/difficulty
+    ANALYTICS_ROLLUP_SQL = """
+        INSERT INTO analytics_daily AS a (
+            day, interview_type, difficulty, sessions_started, sessions_completed, sessions_abandoned,
+            turns, llm_calls, llm_latency_ms, prompt_tokens, cached_tokens
+        )
+        SELECT day, interview_type, difficulty, SUM(started), SUM(completed), SUM(abandoned),
+               SUM(turns), SUM(llm_calls), SUM(llm_latency_ms), SUM(prompt_tokens), SUM(cached_tokens)
+        FROM (
+            SELECT (started_at AT TIME ZONE 'UTC')::date AS day, interview_type, difficulty,
+                   1 AS started, 0 AS completed, 0 AS abandoned, 0 AS turns,
+                   0 AS llm_calls, 0 AS llm_latency_ms, 0 AS prompt_tokens, 0 AS cached_tokens
+            FROM interview_sessions
+            WHERE started_at >= %(lo)s AND started_at < %(hi)s
+            UNION ALL
+            SELECT (completed_at AT TIME ZONE 'UTC')::date, interview_type, difficulty,
+                   0, (status = 'completed')::int, (status = 'abandoned')::int, 0, 0, 0, 0, 0
+            FROM interview_sessions
+            WHERE completed_at >= %(lo)s AND completed_at < %(hi)s
+            UNION ALL
+            SELECT (m.timestamp AT TIME ZONE 'UTC')::date, s.interview_type, s.difficulty,
+                   0, 0, 0, 1, 0, 0, 0, 0
+            FROM chat_messages m
+            JOIN interview_sessions s ON s.session_id = m.session_id
+            WHERE m.role = 'user' AND m.timestamp >= %(lo)s AND m.timestamp < %(hi)s
+            UNION ALL
+            SELECT (u.created_at AT TIME ZONE 'UTC')::date,
+                   COALESCE(s.interview_type, 'Unknown'), COALESCE(s.difficulty, 'Unknown'),
+                   0, 0, 0, 0, 1, u.latency_ms, u.prompt_tokens, u.cached_tokens
+            FROM llm_usage u
+            LEFT JOIN interview_sessions s ON s.session_id = u.session_id
+            WHERE u.created_at >= %(lo)s AND u.created_at < %(hi)s
+        ) events
+        GROUP BY day, interview_type, difficulty
+        ON CONFLICT (day, interview_type, difficulty) DO UPDATE SET
+            sessions_started = a.sessions_started + EXCLUDED.sessions_started,
+            sessions_completed = a.sessions_completed + EXCLUDED.sessions_completed,
+            sessions_abandoned = a.sessions_abandoned + EXCLUDED.sessions_abandoned,
+            turns = a.turns + EXCLUDED.turns,
+            llm_calls = a.llm_calls + EXCLUDED.llm_calls,
+            llm_latency_ms = a.llm_latency_ms + EXCLUDED.llm_latency_ms,
+            prompt_tokens = a.prompt_tokens + EXCLUDED.prompt_tokens,
+            cached_tokens = a.cached_tokens + EXCLUDED.cached_tokens
+    """
+
+    def refresh_analytics(self, settle_seconds: float = 120, max_window_days: int = 7) -> Optional[tuple]:
+        """Fold events since the last refresh into analytics_daily. Returns the (from, to) window, or None.
+
+        Each event is counted exactly once: the watermark moves in the same transaction
+        as the rollup, concurrent refreshes serialize on the analytics_state row, and
+        the window stops settle_seconds short of now so in-flight transactions land first.
+        Turns are counted from chat_messages, so transcript-layout sessions contribute none.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                INSERT INTO analytics_state (name, refreshed_through)
+                SELECT 'daily', COALESCE(MIN(started_at), NOW()) FROM interview_sessions
+                ON CONFLICT (name) DO NOTHING
+            """)
+            cursor.execute("""
+                SELECT refreshed_through,
+                       LEAST(NOW() - make_interval(secs => %s), refreshed_through + make_interval(days => %s))
+                FROM analytics_state WHERE name = 'daily'
+                FOR UPDATE
+            """, (settle_seconds, max_window_days))
+            lo, hi = cursor.fetchone()
+            if hi <= lo:
+                conn.rollback()
+                return None
+            cursor.execute(self.ANALYTICS_ROLLUP_SQL, {"lo": lo, "hi": hi})
+            cursor.execute("UPDATE analytics_state SET refreshed_through = %s WHERE name = 'daily'", (hi,))
+            conn.commit()
+            return lo, hi
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    def get_analytics_daily(self, days: int = 30) -> List[Dict]:
+        """Rollup rows for the last `days` days (bounded by days x types x difficulties)."""
+        conn = self.get_read_connection()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute("""
+            SELECT day, interview_type, difficulty, sessions_started, sessions_completed, sessions_abandoned,
+                   turns, llm_calls, llm_latency_ms, prompt_tokens, cached_tokens
+            FROM analytics_daily
+            WHERE day > CURRENT_DATE - %s
+            ORDER BY day, interview_type, difficulty
+        """, (days,))
+        rows = [dict(row) for row in cursor.fetchall()]
+        cursor.close()
+        conn.close()
+        return rows
+
+    def get_analytics_refreshed_through(self) -> Optional[datetime]:
+        conn = self.get_read_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT refreshed_through FROM analytics_state WHERE name = 'daily'")
+        row = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        return row[0] if row else None
+
+    # ─── Search ────────────────────────────────────────────────────────────
+
+    def search_messages(self, user_id: int, query: str, limit: int = 20, offset: int = 0) -> List[Dict]:
+        """Ranked full-text search over a user's interview messages, with highlighted snippets.
+
+        Uses the GIN-indexed search_vector on chat_messages (added by migrate_schema.py), so
+        sessions stored only in the transcript layout, or moved to the archive tier
+        (archive_old_sessions), are not searchable. Snippets are HTML:
+        message text is escaped and matches are wrapped in <mark>. Returns up to `limit`
+        results starting at `offset`. Raises SearchUnavailableError until the migration has run.
+        """
+        conn = self.get_read_connection(user_id=user_id)
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            # Rank and page first, then build snippets only for the rows being returned
+            cursor.execute("""
+                SELECT hits.message_id, hits.session_id, hits.role, hits.timestamp,
+                       hits.interview_type, hits.difficulty, hits.started_at, hits.rank,
+                       ts_headline('english',
+                                   replace(replace(replace(m.content, '&', '&amp;'), '<', '&lt;'), '>', '&gt;'),
+                                   hits.query,
+                                   'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=30, MinWords=10')
+                           AS snippet
+                FROM (
+                    SELECT m.message_id, m.session_id, m.role, m.timestamp,
+                           s.interview_type, s.difficulty, s.started_at, q.query,
+                           ts_rank_cd(m.search_vector, q.query) AS rank
+                    FROM chat_messages m
+                    JOIN interview_sessions s ON s.session_id = m.session_id
+                    CROSS JOIN websearch_to_tsquery('english', %s) AS q(query)
+                    WHERE s.user_id = %s AND m.search_vector @@ q.query
+                    ORDER BY rank DESC, m.message_id DESC
+                    LIMIT %s OFFSET %s
+                ) hits
+                JOIN chat_messages m ON m.message_id = hits.message_id
+                ORDER BY hits.rank DESC, hits.message_id DESC
+            """, (query, user_id, limit, offset))
+            return [dict(row) for row in cursor.fetchall()]
+        except psycopg2.errors.UndefinedColumn:
+            raise SearchUnavailableError("Search is not set up yet (run: python migrate_schema.py search)")
+        finally:
+            cursor.close()
+            conn.close()
+
     # ─── Resume Management ─────────────────────────────────────────────────
 
     def upload_resume(self, user_id: int, filename: str, content: str) -> tuple:
-        """Upload a new resume for a user. Returns (resume_id, success, message)."""
+        """Upload a new resume for a user. Returns (resume_id, success, message).
+
+        Content is normalized and hashed; re-uploading the same resume returns the existing row.
+        """
+        content = normalize_text(content)
+        if not content:
+            return None, False, "Resume is empty"
+        if len(content) > MAX_RESUME_CHARS:
+            return None, False, f"Resume is too large (max {MAX_RESUME_CHARS} characters)"
+        resume_hash = content_hash(content)
         conn = self.get_connection()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         try:
+            cursor.execute(
+                "SELECT resume_id FROM resumes WHERE user_id = %s AND content_hash = %s LIMIT 1",
+                (user_id, resume_hash)
+            )
+            existing = cursor.fetchone()
+            if existing:
+                return existing['resume_id'], True, "Resume already uploaded"
             cursor.execute("""
-                INSERT INTO resumes (user_id, filename, content)
-                VALUES (%s, %s, %s)
+                INSERT INTO resumes (user_id, filename, content, content_hash)
+                VALUES (%s, %s, %s, %s)
                 RETURNING resume_id
-            """, (user_id, filename, content))
+            """, (user_id, filename, content, resume_hash))
             resume_id = cursor.fetchone()['resume_id']
             conn.commit()
+            self._mark_write(user_id=user_id)
             return resume_id, True, "Resume uploaded successfully"
         except Exception as e:
             conn.rollback()
@@ -400,7 +1658,7 @@ class InterviewDatabase:
 
     def get_user_resumes(self, user_id: int) -> List[Dict]:
         """Get all resumes for a user without content (metadata only)."""
-        conn = self.get_connection()
+        conn = self.get_read_connection(user_id=user_id)
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         cursor.execute("""
             SELECT resume_id, filename, uploaded_at
@@ -415,7 +1673,7 @@ class InterviewDatabase:
 
     def get_resume(self, user_id: int, resume_id: int) -> Optional[Dict]:
         """Get full resume details (including content)."""
-        conn = self.get_connection()
+        conn = self.get_read_connection(user_id=user_id)
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         cursor.execute("""
             SELECT resume_id, filename, content, uploaded_at
@@ -436,6 +1694,7 @@ class InterviewDatabase:
             if cursor.rowcount == 0:
                 return False, "Resume not found or not authorized to delete"
             conn.commit()
+            self._mark_write(user_id=user_id)
             return True, "Resume deleted successfully"
         except Exception as e:
             conn.rollback()
@@ -0,0 +1,80 @@
+"""
+Background purge of deleted accounts.
+
+DELETE /profile only disables the account and queues a deletion job. This worker
+deletes the user's rows in small batches (one short transaction each) so large
+accounts never hold long locks on chat_messages. Jobs persist in deletion_jobs,
+so an interrupted purge resumes after a restart.
+
+Runs inside the API process by default (DELETION_WORKER_ENABLED=1), or standalone:
+    python deletion_worker.py
+
+Configuration:
+    DELETION_BATCH_SIZE     rows per transaction (default 500)
+    DELETION_BATCH_PAUSE    seconds to sleep between batches (default 0.05)
+    DELETION_POLL_SECONDS   idle wait between checks for new jobs (default 5)
+"""
+
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from sharding import ShardedInterviewDatabase, open_database, shard_databases
+
+DELETION_BATCH_SIZE = int(os.getenv("DELETION_BATCH_SIZE", "500"))
+DELETION_BATCH_PAUSE = float(os.getenv("DELETION_BATCH_PAUSE", "0.05"))
+DELETION_POLL_SECONDS = float(os.getenv("DELETION_POLL_SECONDS", "5"))
+
+
+def process_pending_deletions(db, stop_event: threading.Event = None) -> int:
+    """Purge every claimable deletion job. Returns the number of accounts fully purged."""
+    sharded = isinstance(db, ShardedInterviewDatabase)
+    purged = 0
+    for shard_db in shard_databases(db):
+        while stop_event is None or not stop_event.is_set():
+            user_id = shard_db.claim_deletion_job()
+            if user_id is None:
+                break
+            total, done = 0, False
+            while not done:
+                if stop_event is not None and stop_event.is_set():
+                    # Left as 'running'; it becomes claimable again once its heartbeat goes stale
+                    return purged
+                deleted, done = shard_db.purge_user_batch(user_id, DELETION_BATCH_SIZE)
+                total += deleted
+                if total and total % (DELETION_BATCH_SIZE * 20) < deleted:
+                    print(f"Purging user {user_id}: {total} rows deleted so far")
+                time.sleep(DELETION_BATCH_PAUSE)
+            if sharded:
+                db.forget_user(user_id)
+            purged += 1
+            print(f"Purged user {user_id}: {total} rows deleted")
+    return purged
+
+
+def run_deletion_worker(db, stop_event: threading.Event):
+    """Poll for deletion jobs until stop_event is set."""
+    while not stop_event.is_set():
+        try:
+            process_pending_deletions(db, stop_event)
+        except Exception as e:
+            print(f"Deletion worker error: {e}")
+        stop_event.wait(DELETION_POLL_SECONDS)
+
+
+def start_deletion_worker(db) -> threading.Event:
+    """Run the worker on a daemon thread. Set the returned event to stop it."""
+    stop_event = threading.Event()
+    threading.Thread(target=run_deletion_worker, args=(db, stop_event), daemon=True).start()
+    return stop_event
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    db = open_database()
+    try:
+        run_deletion_worker(db, threading.Event())
+    except KeyboardInterrupt:
+        pass
@@ -1,23 +1,73 @@
-from fastapi import FastAPI, HTTPException, Depends
+from dotenv import load_dotenv
+
+# Load .env before local modules read their settings at import time
+load_dotenv()
+
+from fastapi import FastAPI, HTTPException, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
-from openai import OpenAI
-from database import InterviewDatabase
-from dotenv import load_dotenv
+from database import ReadYourWritesMiddleware, SearchUnavailableError, WRITE_MARKER_HEADER
+from sharding import open_database
+from resume_utils import (
+    build_digest, MAX_RESUME_CHARS, MAX_JOB_DESCRIPTION_CHARS,
+    RESUME_DIGEST_TOKENS, JOB_DESCRIPTION_DIGEST_TOKENS
+)
+from analysis import (
+    chat_completion, area_config_for, build_scoring_instructions, parse_scored_reply, build_dashboard_payload,
+    score_sessions, SCORING_VERSION
+)
+from profiling import (
+    ProfilingMiddleware, recent_profiles,
+    PROFILING_ENABLED, PROFILE_SAMPLE_RATE, SLOW_REQUEST_MS
+)
+from deletion_worker import start_deletion_worker
+from analytics_worker import start_analytics_worker
+from singleflight import KeyReuseError, SingleFlight
+from auth import TokenAuth, AuthError
+from functools import lru_cache
+from typing import Optional
 import os
-import re
-import jwt
-import datetime
-
-load_dotenv()
+import json
+import hashlib
 
 app = FastAPI(title="HireReady API")
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-db = InterviewDatabase()
+# Route each user's data to one of several databases when shards are configured
+db = open_database()
 security = HTTPBearer()
 
 SECRET_KEY = os.getenv("SECRET_KEY", "hireready-secret-key-2026")
+# Admins by user ID: usernames can be changed (and freed names re-registered) by users
+ADMIN_USER_IDS = {int(u) for u in os.getenv("ADMIN_USER_IDS", "").split(",") if u.strip()}
+# Verified tokens are cached in memory; revocations are synced from the users table
+token_auth = TokenAuth(db, SECRET_KEY)
+
+# Retried interview turns replay the first response instead of calling the LLM again
+turn_flights = SingleFlight(ttl_seconds=float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "300")))
+# Concurrent dashboard loads for one user share a single computation (no caching)
+dashboard_flights = SingleFlight()
+
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# ─── Background Workers ────────────────────────────────────────────────────────
+_worker_stops = []
+
+@app.on_event("startup")
+def start_workers():
+    _worker_stops.append(token_auth.start_sync())
+    if os.getenv("DELETION_WORKER_ENABLED", "1").lower() in ("1", "true", "yes"):
+        _worker_stops.append(start_deletion_worker(db))
+    if os.getenv("ANALYTICS_WORKER_ENABLED", "1").lower() in ("1", "true", "yes"):
+        _worker_stops.append(start_analytics_worker(db))
+
+@app.on_event("shutdown")
+def stop_workers():
+    for stop_event in _worker_stops:
+        stop_event.set()
+
+# ─── Read-Your-Writes ──────────────────────────────────────────────────────────
+app.add_middleware(ReadYourWritesMiddleware)
 
 # ─── CORS ─────────────────────────────────────────────────────────────────────
 app.add_middleware(
@@ -26,6 +76,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[WRITE_MARKER_HEADER],
 )
 
 # ─── Pydantic Models ───────────────────────────────────────────────────────────
@@ -48,6 +99,7 @@ class ChatRequest(BaseModel):
     num_questions: int
     resume_text: str = ""
     job_description: str = ""
+    inline_scoring: bool = False
 
 class UpdateStatusRequest(BaseModel):
     status: str
@@ -64,53 +116,91 @@ class ResumeUploadRequest(BaseModel):
     content: str
 
 # ─── JWT Helpers ───────────────────────────────────────────────────────────────
-def create_token(user_id: int, username: str) -> str:
-    payload = {
-        "user_id": user_id,
-        "username": username,
-        "exp": datetime.datetime.utcnow() + datetime.timedelta(days=7)
-    }
-    return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
+def create_token(user_id: int, username: str, uow=None) -> str:
+    """Issue a token at the user's current version; older versions are revoked right away here."""
+    token_version = (uow or db).get_token_version(user_id)
+    token_auth.note_version(user_id, token_version)
+    return token_auth.issue(user_id, username, token_version)
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=["HS256"])
-        return payload
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+        return token_auth.verify(credentials.credentials)
+    except AuthError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
+def require_admin(user=Depends(verify_token)):
+    if user.get("user_id") not in ADMIN_USER_IDS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
 
 # ─── Auth Routes ───────────────────────────────────────────────────────────────
 @app.post("/auth/signup")
 def signup(req: AuthRequest):
-    user_id, success, message = db.create_user(req.username, req.password)
-    if not success:
-        raise HTTPException(status_code=400, detail=message)
-    token = create_token(user_id, req.username)
+    with db.unit_of_work() as uow:
+        user_id, success, message = uow.create_user(req.username, req.password)
+        if not success:
+            raise HTTPException(status_code=400, detail=message)
+        token = create_token(user_id, req.username, uow)
     return {"token": token, "user_id": user_id, "username": req.username}
 
 @app.post("/auth/login")
 def login(req: AuthRequest):
-    user_id, success, message = db.authenticate_user(req.username, req.password)
-    if not success:
-        raise HTTPException(status_code=401, detail=message)
-    token = create_token(user_id, req.username)
+    with db.unit_of_work() as uow:
+        user_id, success, message = uow.authenticate_user(req.username, req.password)
+        if not success:
+            raise HTTPException(status_code=401, detail=message)
+        token = create_token(user_id, req.username, uow)
     return {"token": token, "user_id": user_id, "username": req.username}
 
 # ─── Interview Routes ──────────────────────────────────────────────────────────
+def _request_fingerprint(req: BaseModel) -> str:
+    return hashlib.sha256(json.dumps(req.model_dump(), sort_keys=True).encode("utf-8")).hexdigest()
+
+def _run_turn(endpoint: str, req: BaseModel, user: dict, idempotency_key: Optional[str], fn, replay: bool):
+    """Run an interview turn once per Idempotency-Key (or identical request body).
+
+    With an explicit key the response is cached for replay; reusing the key with a
+    different body is a 422. Without one, identical concurrent requests share one call,
+    and replay only applies when `replay` is set.
+    """
+    fingerprint = _request_fingerprint(req)
+    if idempotency_key:
+        try:
+            return turn_flights.do((endpoint, user["user_id"], "key", idempotency_key), fn, fingerprint=fingerprint)
+        except KeyReuseError:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request body")
+    return turn_flights.do((endpoint, user["user_id"], "body", fingerprint), fn, cache=replay)
+
 @app.post("/interview/start")
-def start_interview(req: StartSessionRequest, user=Depends(verify_token)):
+def start_interview(req: StartSessionRequest, user=Depends(verify_token),
+                    idempotency_key: Optional[str] = Header(default=None)):
+    # Identical start requests without a key are only coalesced while in flight:
+    # starting the same configuration again later is a new interview
+    return _run_turn("start", req, user, idempotency_key, lambda: _start_interview(req, user), replay=False)
+
+def _check_document_sizes(req: BaseModel):
+    if len(req.resume_text) > MAX_RESUME_CHARS:
+        raise HTTPException(status_code=400, detail=f"Resume is too large (max {MAX_RESUME_CHARS} characters)")
+    if len(req.job_description) > MAX_JOB_DESCRIPTION_CHARS:
+        raise HTTPException(
+            status_code=400, detail=f"Job description is too large (max {MAX_JOB_DESCRIPTION_CHARS} characters)"
+        )
+
+def _start_interview(req: StartSessionRequest, user: dict) -> dict:
+    _check_document_sizes(req)
     system_prompt = build_system_prompt(
         req.interview_type, req.difficulty, req.num_questions, req.resume_text, req.job_description
     )
     messages = [{"role": "system", "content": system_prompt}]
-    response = client.chat.completions.create(model="gpt-4o", messages=messages)
+    response, usage = chat_completion(model="gpt-4o", messages=messages)
     ai_msg = response.choices[0].message.content
-    session_id = db.create_session(
-        user["user_id"], req.interview_type, req.difficulty, req.num_questions
-    )
-    db.save_message(session_id, "assistant", ai_msg)
+    # Committed before the result can be replayed to a retry
+    with db.unit_of_work() as uow:
+        session_id = uow.create_session(
+            user["user_id"], req.interview_type, req.difficulty, req.num_questions
+        )
+        uow.save_message(session_id, "assistant", ai_msg)
+        uow.record_llm_usage(user["user_id"], session_id, "interview.start", **usage)
     return {
         "session_id": session_id,
         "message": ai_msg,
@@ -118,27 +208,61 @@ def start_interview(req: StartSessionRequest, user=Depends(verify_token)):
     }
 
 @app.post("/interview/chat")
-def chat(req: ChatRequest, user=Depends(verify_token)):
-    # Save the latest user message if present
-    if req.messages and req.messages[-1]["role"] == "user":
-        db.save_message(req.session_id, "user", req.messages[-1]["content"])
-    
-    response = client.chat.completions.create(model="gpt-4o", messages=req.messages)
-    ai_reply = response.choices[0].message.content
-    db.save_message(req.session_id, "assistant", ai_reply)
-    
-    # Check for completion: contains evaluation keywords OR message count suggests final eval
-    reply_lower = ai_reply.lower()
-    eval_keywords = ["evaluation", "overall", "assessment", "final feedback", "feedback", "summary", "conclusion"]
-    has_eval_keyword = any(kw in reply_lower for kw in eval_keywords)
+def chat(req: ChatRequest, user=Depends(verify_token), idempotency_key: Optional[str] = Header(default=None)):
+    # The same session history always asks for the same next turn, so body replays are safe
+    return _run_turn("chat", req, user, idempotency_key, lambda: _chat_turn(req, user), replay=True)
+
+def _chat_turn(req: ChatRequest, user: dict) -> dict:
+    _check_document_sizes(req)
+    # Always lead with the session's server-built system prompt (the same bytes as the
+    # first turn) so every turn shares the provider-cached prefix; client system messages are dropped
+    system_prompt = build_system_prompt(
+        req.interview_type, req.difficulty, req.num_questions, req.resume_text, req.job_description
+    )
+    messages = [{"role": "system", "content": system_prompt}] + [m for m in req.messages if m["role"] != "system"]
+    metadata = None
+    if req.inline_scoring:
+        # Ask for the reply plus per-answer scores in one structured turn so the
+        # dashboard can aggregate stored scores instead of re-scoring later.
+        # The instructions go last so the history before them stays a cacheable prefix.
+        area_config = area_config_for(req.interview_type)
+        scoring_messages = messages + [{"role": "system", "content": build_scoring_instructions(area_config)}]
+        response, usage = chat_completion(
+            model="gpt-4o", messages=scoring_messages, response_format={"type": "json_object"}
+        )
+        ai_reply, metadata = parse_scored_reply(response.choices[0].message.content, area_config)
+    else:
+        response, usage = chat_completion(model="gpt-4o", messages=messages)
+        ai_reply = response.choices[0].message.content
     
     # Also check if we've collected enough messages (user answers)
     user_message_count = sum(1 for msg in req.messages if msg["role"] == "user")
-    is_complete = has_eval_keyword or user_message_count >= req.num_questions
+    if metadata is not None:
+        # Structured turns carry an explicit done flag
+        has_eval_signal = metadata["done"]
+    else:
+        # Check for completion: contains evaluation keywords OR message count suggests final eval
+        reply_lower = ai_reply.lower()
+        eval_keywords = ["evaluation", "overall", "assessment", "final feedback", "feedback", "summary", "conclusion"]
+        has_eval_signal = any(kw in reply_lower for kw in eval_keywords)
+    is_complete = has_eval_signal or user_message_count >= req.num_questions
     
+    # The whole turn is written in one transaction after the LLM call, so a failed
+    # turn leaves nothing behind and no connection is held while waiting on the model
+    with db.unit_of_work() as uow:
+        # Save the latest user message if present
+        if req.messages and req.messages[-1]["role"] == "user":
+            uow.save_message(req.session_id, "user", req.messages[-1]["content"])
+        uow.save_message(req.session_id, "assistant", ai_reply, metadata)
+        uow.record_llm_usage(user["user_id"], req.session_id, "interview.chat", **usage)
+        if is_complete:
+            uow.update_session_status(req.session_id, "completed")
     if is_complete:
-        db.update_session_status(req.session_id, "completed")
-    return {"message": ai_reply, "completed": is_complete}
+        dashboard_flights.forget(user["user_id"])
+    result = {"message": ai_reply, "completed": is_complete}
+    if metadata is not None:
+        result["scores"] = metadata["scores"]
+    return result
 
 @app.post("/interview/message")
 def save_user_message(session_id: int, content: str, user=Depends(verify_token)):
@@ -148,314 +272,9 @@ def save_user_message(session_id: int, content: str, user=Depends(verify_token))
 @app.patch("/interview/session/{session_id}/status")
 def update_status(session_id: int, req: UpdateStatusRequest, user=Depends(verify_token)):
     db.update_session_status(session_id, req.status)
+    dashboard_flights.forget(user["user_id"])
     return {"success": True}
 
-TECHNICAL_AREAS = [
-    {
-        "name": "Algorithms / DSA",
-        "keywords": ["algorithm", "data structure", "complexity", "time complexity", "space complexity", "optimization", "o(n)", "binary search", "sorting", "tree", "graph", "dynamic programming"],
-        "recommendation": "Practice 3–4 timed algorithm problems per week focusing on complexity analysis and edge cases."
-    },
-    {
-        "name": "Coding Quality",
-        "keywords": ["code", "coding", "implementation", "syntax", "edge case", "bug", "test case", "clean code", "readable", "modular"],
-        "recommendation": "Write clean, modular code from the start and think through edge cases before coding."
-    },
-    {
-        "name": "System Design",
-        "keywords": ["system design", "scalability", "architecture", "throughput", "latency", "database", "cache", "api", "distributed", "load balancer"],
-        "recommendation": "Solve one system-design prompt weekly and practice discussing trade-offs + scaling strategies."
-    },
-    {
-        "name": "Problem Solving",
-        "keywords": ["approach", "problem solving", "break down", "reasoning", "hypothesis", "strategy", "clarifying questions", "assumptions"],
-        "recommendation": "Spend 5 minutes framing your approach before coding and verify with small test cases."
-    },
-    {
-        "name": "Communication",
-        "keywords": ["communicat", "clarity", "explain", "walk through", "thought process", "articulate", "justify"],
-        "recommendation": "Talk through your thought process clearly: state assumptions, explain approach, and justify decisions."
-    },
-]
-
-BEHAVIORAL_AREAS = [
-    {
-        "name": "STAR Framework",
-        "keywords": ["star", "situation", "task", "action", "result", "specific", "measurable", "example"],
-        "recommendation": "Structure every answer using STAR: Situation → Task → Action → Result with measurable outcomes."
-    },
-    {
-        "name": "Leadership",
-        "keywords": ["leadership", "lead", "mentor", "influence", "initiative", "ownership", "decision", "responsibility"],
-        "recommendation": "Prepare 2–3 stories showing ownership, initiative, and influence without direct authority."
-    },
-    {
-        "name": "Teamwork",
-        "keywords": ["collaboration", "team", "stakeholder", "cross-functional", "communication", "conflict", "feedback"],
-        "recommendation": "Highlight examples of navigating team dynamics, resolving conflicts, and collaborating effectively."
-    },
-    {
-        "name": "Impact",
-        "keywords": ["impact", "results", "improvement", "metrics", "outcome", "value", "measurable", "business"],
-        "recommendation": "Quantify your impact with specific metrics (e.g., '30% faster', 'saved $50K', '10K users')."
-    },
-    {
-        "name": "Problem Solving",
-        "keywords": ["problem", "challenge", "obstacle", "solution", "approach", "overcome", "analytical"],
-        "recommendation": "Show structured problem-solving: how you identified root cause, explored options, and decided."
-    },
-]
-
-MIXED_AREAS = [
-    {
-        "name": "Technical Skills",
-        "keywords": ["algorithm", "code", "system design", "architecture", "complexity", "optimization", "implementation"],
-        "recommendation": "Balance coding practice with system design discussions weekly."
-    },
-    {
-        "name": "Behavioral Skills",
-        "keywords": ["star", "leadership", "collaboration", "impact", "ownership", "conflict", "team"],
-        "recommendation": "Prepare 3–5 STAR stories covering leadership, conflict, and cross-functional collaboration."
-    },
-    {
-        "name": "Communication",
-        "keywords": ["communicat", "clarity", "explain", "articulate", "structure", "justify"],
-        "recommendation": "Practice explaining both technical concepts and behavioral examples clearly and concisely."
-    },
-    {
-        "name": "Problem Solving",
-        "keywords": ["approach", "problem solving", "strategy", "reasoning", "break down", "analytical"],
-        "recommendation": "Demonstrate structured problem-solving in both technical and situational contexts."
-    },
-]
-
-POSITIVE_WORDS = ["strong", "good", "great", "clear", "excellent", "solid", "well", "effective", "confident"]
-NEGATIVE_WORDS = ["improve", "weak", "lacking", "struggle", "unclear", "missed", "incorrect", "incomplete", "needs work"]
-
-
-def _normalize(text: str) -> str:
-    return re.sub(r"\s+", " ", (text or "").lower()).strip()
-
-
-def _area_score(text: str, keywords: list[str]) -> int:
-    keyword_hits = sum(text.count(k) for k in keywords)
-    positive_hits = sum(text.count(w) for w in POSITIVE_WORDS)
-    negative_hits = sum(text.count(w) for w in NEGATIVE_WORDS)
-    score = 45 + min(keyword_hits, 10) * 4 + min(positive_hits, 8) * 2 - min(negative_hits, 8) * 3
-    return max(20, min(95, score))
-
-
-def analyze_qa_pairs_with_ai(qa_pairs: list[dict], area_config: list[dict]) -> dict:
-    """Use AI to analyze Q&A pairs and determine coverage and performance for each area."""
-    if not qa_pairs:
-        return {}
-    
-    area_names = [cfg["name"] for cfg in area_config]
-    area_descriptions = {cfg["name"]: ", ".join(cfg["keywords"][:5]) for cfg in area_config}
-    
-    # Build analysis prompt
-    qa_text = ""
-    for idx, qa in enumerate(qa_pairs[:10], 1):  # Limit to last 10 Q&As to avoid token limits
-        qa_text += f"\n\nQ{idx}: {qa['question']}\nA{idx}: {qa['answer']}\n"
-        if qa.get('feedback'):
-            qa_text += f"Feedback: {qa['feedback']}\n"
-    
-    analysis_prompt = f"""You are analyzing a technical interview. Below are the questions asked, candidate answers, and interviewer feedback.
-
-Available assessment areas:
-{chr(10).join(f"- {name}: {area_descriptions[name]}" for name in area_names)}
-
-For each area that was ACTUALLY COVERED in the interview questions:
-1. Assign a performance score 0-100 based on answer quality and feedback
-2. Note specific strengths or weaknesses
-
-Respond in this exact JSON format:
-{{
-  "covered_areas": [
-    {{
-      "area": "exact area name",
-      "score": 75,
-      "evidence": "brief explanation of what was tested and how they performed"
-    }}
-  ]
-}}
-
-Only include areas that were actually asked about. If coding wasn't tested, don't include it.
-
-Interview Q&A:
-{qa_text}
-
-JSON Response:"""
-
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": analysis_prompt}],
-            temperature=0.3,
-            max_tokens=800
-        )
-        
-        result_text = response.choices[0].message.content.strip()
-        # Extract JSON from markdown code blocks if present
-        if "```json" in result_text:
-            result_text = result_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in result_text:
-            result_text = result_text.split("```")[1].split("```")[0].strip()
-        
-        import json
-        analysis = json.loads(result_text)
-        return analysis
-    except Exception as e:
-        print(f"AI analysis error: {e}")
-        return {}
-
-
-def build_dashboard_payload(completed_sessions: list[dict]) -> dict:
-    if not completed_sessions:
-        return {
-            "has_data": False,
-            "areas": [],
-            "strengths": [],
-            "improvements": [],
-            "recommendations": [],
-            "summary": "Complete an interview to unlock personalized review and recommendations.",
-            "source_sessions": 0,
-            "interview_context": "Mixed"
-        }
-
-    # Detect most common interview type from recent completed sessions
-    type_counts = {}
-    for session in completed_sessions:
-        itype = session.get("interview_type", "Mixed")
-        type_counts[itype] = type_counts.get(itype, 0) + 1
-    
-    dominant_type = max(type_counts.items(), key=lambda x: x[1])[0] if type_counts else "Mixed"
-    
-    # Select area config based on interview type
-    if dominant_type == "Technical":
-        area_config = TECHNICAL_AREAS
-    elif dominant_type == "Behavioral":
-        area_config = BEHAVIORAL_AREAS
-    else:
-        area_config = MIXED_AREAS
-
-    # Extract Q&A pairs from the most recent session
-    qa_pairs = []
-    for session in completed_sessions[:3]:  # Analyze last 3 sessions
-        messages = session.get("messages", [])
-        current_question = None
-        current_answer = None
-        current_feedback = None
-        
-        for msg in messages:
-            role = msg.get("role", "")
-            content = msg.get("content", "")
-            
-            if role == "assistant":
-                # Check if this is feedback (short) or a new question
-                if current_answer and len(content) < 500:
-                    # Likely feedback for previous answer
-                    current_feedback = content
-                    if current_question and current_answer:
-                        qa_pairs.append({
-                            "question": current_question,
-                            "answer": current_answer,
-                            "feedback": current_feedback
-                        })
-                    current_question = None
-                    current_answer = None
-                    current_feedback = None
-                else:
-                    # New question
-                    if current_question and current_answer:
-                        qa_pairs.append({
-                            "question": current_question,
-                            "answer": current_answer,
-                            "feedback": current_feedback
-                        })
-                    current_question = content
-                    current_answer = None
-                    current_feedback = None
-            elif role == "user":
-                current_answer = content
-        
-        # Add final Q&A if exists
-        if current_question and current_answer:
-            qa_pairs.append({
-                "question": current_question,
-                "answer": current_answer,
-                "feedback": current_feedback
-            })
-
-    # Use AI to analyze Q&A pairs
-    ai_analysis = analyze_qa_pairs_with_ai(qa_pairs, area_config)
-    
-    covered_areas_data = ai_analysis.get("covered_areas", [])
-    
-    if not covered_areas_data:
-        # Fallback to old keyword-based method
-        assistant_text_chunks = []
-        for session in completed_sessions:
-            for message in session.get("messages", []):
-                if message.get("role") == "assistant":
-                    assistant_text_chunks.append(message.get("content", ""))
-        
-        corpus = _normalize("\n".join(assistant_text_chunks))
-        areas = [{"name": cfg["name"], "score": _area_score(corpus, cfg["keywords"])} for cfg in area_config]
-    else:
-        # Use AI analysis results
-        areas = [{"name": item["area"], "score": item["score"]} for item in covered_areas_data]
-    
-    if not areas:
-        return {
-            "has_data": False,
-            "areas": [],
-            "strengths": [],
-            "improvements": [],
-            "recommendations": [],
-            "summary": "Not enough data to analyze. Complete more interview questions.",
-            "source_sessions": len(completed_sessions),
-            "interview_context": dominant_type
-        }
-    
-    ranked = sorted(areas, key=lambda a: a["score"], reverse=True)
-    
-    top_areas = ranked[:min(2, len(ranked))]
-    low_areas = list(reversed(ranked[-min(2, len(ranked)):]))
-    
-    # Get recommendations for low-scoring areas
-    rec_map = {cfg["name"]: cfg["recommendation"] for cfg in area_config}
-    recommendations = []
-    for a in low_areas:
-        if a["name"] in rec_map:
-            recommendations.append(rec_map[a["name"]])
-    
-    strengths = [f"{a['name']} ({a['score']}/100)" for a in top_areas]
-    improvements = [f"{a['name']} ({a['score']}/100)" for a in low_areas]
-    
-    interview_label = f"{dominant_type} interview" if dominant_type != "Mixed" else "interviews"
-    
-    if top_areas and low_areas:
-        summary = (
-            f"Based on your last {len(completed_sessions)} completed {interview_label}"
-            f"{'s' if len(completed_sessions) > 1 else ''}, your strongest area is {top_areas[0]['name']}. "
-            f"Focus next on {low_areas[0]['name']} to improve performance."
-        )
-    else:
-        summary = f"Analysis based on {len(completed_sessions)} completed {interview_label}{'s' if len(completed_sessions) > 1 else ''}."
-
-    return {
-        "has_data": True,
-        "areas": areas,
-        "strengths": strengths,
-        "improvements": improvements,
-        "recommendations": recommendations,
-        "summary": summary,
-        "source_sessions": len(completed_sessions),
-        "interview_context": dominant_type
-    }
-
-
 # ─── History Routes ────────────────────────────────────────────────────────────
 @app.get("/history/sessions")
 def get_sessions(user=Depends(verify_token)):
@@ -480,22 +299,51 @@ def get_session_details(session_id: int, user=Depends(verify_token)):
                 msg[k] = v.isoformat()
     return details
 
+@app.get("/history/search")
+def search_history(q: str, page: int = 1, page_size: int = 20, user=Depends(verify_token)):
+    """Search the user's messages. Sessions moved to the archive tier (see archive_transcripts.py) are not included."""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Search query is required")
+    page = max(page, 1)
+    page_size = max(1, min(page_size, 50))
+    # Fetch one extra row to know whether another page exists without a COUNT(*)
+    try:
+        results = db.search_messages(user["user_id"], q, limit=page_size + 1, offset=(page - 1) * page_size)
+    except SearchUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    has_more = len(results) > page_size
+    results = results[:page_size]
+    for r in results:
+        for k, v in r.items():
+            if hasattr(v, 'isoformat'):
+                r[k] = v.isoformat()
+    return {"query": q, "results": results, "page": page, "page_size": page_size, "has_more": has_more}
+
 @app.get("/history/stats")
 def get_stats(user=Depends(verify_token)):
     return db.get_user_stats(user["user_id"])
 
 @app.get("/history/dashboard")
 def get_dashboard(user=Depends(verify_token)):
-    completed = db.get_completed_sessions_with_messages(user["user_id"], limit=30)
-    # Convert any datetime objects to ISO format
-    for session in completed:
-        for key in ["started_at", "completed_at"]:
-            if key in session and hasattr(session[key], "isoformat"):
-                session[key] = session[key].isoformat()
-        for msg in session.get("messages", []):
-            if "timestamp" in msg and hasattr(msg["timestamp"], "isoformat"):
-                msg["timestamp"] = msg["timestamp"].isoformat()
-    return build_dashboard_payload(completed)
+    return dashboard_flights.do(user["user_id"], lambda: _build_dashboard(user))
+
+def _build_dashboard(user: dict) -> dict:
+    # Only sessions without a score at the current SCORING_VERSION need their messages and an analysis pass
+    completed = db.get_completed_sessions(user["user_id"], limit=30)
+    session_scores = db.get_session_scores(
+        user["user_id"], [session["session_id"] for session in completed], SCORING_VERSION
+    )
+    unscored = [session for session in completed if session["session_id"] not in session_scores]
+    if unscored:
+        messages = db.get_sessions_messages(user["user_id"], [session["session_id"] for session in unscored])
+        for session in unscored:
+            session["messages"] = messages.get(session["session_id"], [])
+        usage_log = []
+        new_scores, memoize = score_sessions(unscored, usage_log)
+        db.save_session_scores(memoize, SCORING_VERSION)
+        db.record_llm_usage_batch("dashboard.analysis", usage_log)
+        session_scores.update(new_scores)
+    return build_dashboard_payload(completed, session_scores)
 
 # ─── Profile Routes ────────────────────────────────────────────────────────────
 @app.get("/profile")
@@ -509,24 +357,29 @@ def get_profile(user=Depends(verify_token)):
 
 @app.put("/profile/username")
 def update_username(req: UpdateUsernameRequest, user=Depends(verify_token)):
-    success, message = db.update_username(user["user_id"], req.new_username)
-    if not success:
-        raise HTTPException(status_code=400, detail=message)
-    new_token = create_token(user["user_id"], req.new_username)
+    with db.unit_of_work() as uow:
+        success, message = uow.update_username(user["user_id"], req.new_username)
+        if not success:
+            raise HTTPException(status_code=400, detail=message)
+        new_token = create_token(user["user_id"], req.new_username, uow)
     return {"message": message, "token": new_token, "username": req.new_username}
 
 @app.put("/profile/password")
 def update_password(req: UpdatePasswordRequest, user=Depends(verify_token)):
-    success, message = db.update_password(user["user_id"], req.current_password, req.new_password)
-    if not success:
-        raise HTTPException(status_code=400, detail=message)
-    return {"message": message}
+    with db.unit_of_work() as uow:
+        success, message = uow.update_password(user["user_id"], req.current_password, req.new_password)
+        if not success:
+            raise HTTPException(status_code=400, detail=message)
+        # Other sessions' tokens are now revoked; hand this client a fresh one
+        new_token = create_token(user["user_id"], user["username"], uow)
+    return {"message": message, "token": new_token}
 
 @app.delete("/profile")
 def delete_account(user=Depends(verify_token)):
     success, message = db.delete_user(user["user_id"])
     if not success:
         raise HTTPException(status_code=500, detail=message)
+    token_auth.disable_user(user["user_id"])
     return {"message": message}
 
 # ─── Resume Routes ─────────────────────────────────────────────────────────────
@@ -562,22 +415,88 @@ def delete_resume(resume_id: int, user=Depends(verify_token)):
         raise HTTPException(status_code=400, detail=message)
     return {"message": message}
 
+# ─── Admin Routes ──────────────────────────────────────────────────────────────
+@app.get("/admin/deletions")
+def get_deletions(limit: int = 50, admin=Depends(require_admin)):
+    jobs = db.get_deletion_jobs(limit)
+    for job in jobs:
+        for k, v in job.items():
+            if hasattr(v, 'isoformat'):
+                job[k] = v.isoformat()
+    return {"jobs": jobs}
+
+@app.get("/admin/analytics")
+def get_analytics(days: int = 30, admin=Depends(require_admin)):
+    """Cross-user volume, completion and latency, read only from the analytics_daily rollups."""
+    days = max(1, min(days, 366))
+    daily = db.get_analytics_daily(days)
+    totals = {}
+    for row in daily:
+        key = (row["interview_type"], row["difficulty"])
+        if key not in totals:
+            totals[key] = {"interview_type": key[0], "difficulty": key[1]}
+        for column, value in row.items():
+            if column not in ("day", "interview_type", "difficulty"):
+                totals[key][column] = totals[key].get(column, 0) + value
+        row["day"] = row["day"].isoformat()
+    by_type = [totals[key] for key in sorted(totals)]
+    for group in by_type:
+        started, calls = group["sessions_started"], group["llm_calls"]
+        group["completion_rate"] = round(group["sessions_completed"] / started, 4) if started else 0
+        group["avg_turns"] = round(group["turns"] / started, 2) if started else 0
+        group["avg_llm_latency_ms"] = round(group["llm_latency_ms"] / calls) if calls else 0
+        group["cache_hit_rate"] = round(group["cached_tokens"] / group["prompt_tokens"], 4) if group["prompt_tokens"] else 0
+    refreshed_through = db.get_analytics_refreshed_through()
+    return {
+        "days": days,
+        "refreshed_through": refreshed_through.isoformat() if refreshed_through else None,
+        "by_type": by_type,
+        "daily": daily,
+    }
+
+@app.get("/admin/llm-usage")
+def get_llm_usage(hours: int = 24, admin=Depends(require_admin)):
+    usage = db.get_llm_usage_summary(max(hours, 1))
+    for row in usage:
+        # Share of prompt tokens served from the provider's prefix cache
+        row["cache_hit_rate"] = round(row["cached_tokens"] / row["prompt_tokens"], 4) if row["prompt_tokens"] else 0
+        row["avg_latency_ms"] = round(row.pop("latency_ms") / row["calls"]) if row["calls"] else 0
+    return {"hours": max(hours, 1), "usage": usage}
+
+@app.get("/admin/profiles")
+def get_profiles(limit: int = 50, admin=Depends(require_admin)):
+    return {
+        "enabled": PROFILING_ENABLED,
+        "sample_rate": PROFILE_SAMPLE_RATE,
+        "slow_request_ms": SLOW_REQUEST_MS,
+        "profiles": list(reversed(recent_profiles))[:max(limit, 0)],
+    }
+
 # ─── System Prompt ─────────────────────────────────────────────────────────────
-def build_system_prompt(interview_type, difficulty, num_questions, resume_text="", job_description=""):
-    base_prompt = f"""You are an expert technical interviewer conducting a {difficulty} {interview_type} interview. Your job is to:
+# Laid out for provider prompt caching: content shared by the most requests comes first
+# (global rules, then the session's resume/JD digests, then the per-session settings),
+# and the prompt is byte-identical on every turn of a session.
+INTERVIEWER_RULES = """You are an expert technical interviewer conducting a mock interview. Your job is to:
 1. Ask one question at a time.
 2. Wait for the candidate's response before proceeding.
 3. After each answer, provide brief, constructive feedback (2-3 sentences).
 4. Then ask the next question.
-5. After {num_questions} questions, provide a final overall evaluation with strengths and areas for improvement.
+5. After the last question, provide a final overall evaluation with strengths and areas for improvement.
 
 Interview type guidance:
 - Technical: Focus on coding problems, system design, algorithms, and domain knowledge.
 - Behavioral: Use the STAR method (Situation, Task, Action, Result) for responses.
 - Mixed: Alternate between technical and behavioral questions.
 
-Start by greeting the candidate and asking the first question. Be professional, encouraging, and constructive."""
+Be professional, encouraging, and constructive."""
 
+@lru_cache(maxsize=int(os.getenv("SYSTEM_PROMPT_CACHE_SIZE", "1024")))
+def build_system_prompt(interview_type, difficulty, num_questions, resume_text="", job_description=""):
+    base_prompt = INTERVIEWER_RULES
+
+    # Compact, cached digests keep the prompt bounded however long the pasted documents are
+    resume_text = build_digest(resume_text, RESUME_DIGEST_TOKENS)
+    job_description = build_digest(job_description, JOB_DESCRIPTION_DIGEST_TOKENS)
     if resume_text or job_description:
         base_prompt += "\n\nAdditional Context:\n"
         if resume_text:
@@ -586,4 +505,8 @@ Start by greeting the candidate and asking the first question. Be professional,
             base_prompt += f"--- Job Description ---\n{job_description}\n\n"
         base_prompt += "Ensure your questions are tailored to the candidate's experience in their resume and the specific requirements mentioned in the job description."
 
-    return base_prompt
\ No newline at end of file
+    base_prompt += f"""
+
+This session: a {difficulty} {interview_type} interview of {num_questions} questions.
+Start by greeting the candidate and asking the first question."""
+    return base_prompt
@@ -0,0 +1,88 @@
+"""
+Schema changes too heavy to run on every startup: applied online, without long table locks.
+
+Usage:
+    python migrate_schema.py messages
+    python migrate_schema.py search [--batch-size 5000]
+    python migrate_schema.py analytics
+
+messages: builds the chat_messages (session_id) index that every per-session message read
+uses, with CREATE INDEX CONCURRENTLY. Run it first on a new deployment.
+
+search: adds chat_messages.search_vector (kept current by a trigger), backfills older
+messages in batches and builds its GIN index, plus an index on interview_sessions.user_id
+that scopes each search to one user, with CREATE INDEX CONCURRENTLY. Until it has run,
+/history/search answers 503.
+
+analytics: builds, with CREATE INDEX CONCURRENTLY, the indexes the analytics worker's
+refresh windows range-scan. The worker runs without them, only slower.
+
+Safe to interrupt and re-run: the backfill only touches rows without a vector, and an
+index left invalid by an interrupted build is rebuilt.
+"""
+
+import argparse
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from database import InterviewDatabase
+from sharding import open_database, shard_databases
+
+
+MESSAGE_INDEXES = [
+    ("idx_chat_messages_session", "ON chat_messages (session_id)"),
+]
+
+SEARCH_INDEXES = [
+    ("idx_chat_messages_search", "ON chat_messages USING GIN (search_vector)"),
+    # Scopes a search to one user's sessions instead of every user's matches
+    ("idx_sessions_user", "ON interview_sessions (user_id)"),
+]
+
+# Range scans for each analytics refresh window
+ANALYTICS_INDEXES = [
+    ("idx_sessions_started", "ON interview_sessions (started_at)"),
+    ("idx_sessions_completed", "ON interview_sessions (completed_at)"),
+    ("idx_chat_messages_timestamp", "ON chat_messages (timestamp)"),
+]
+
+
+def build_indexes(shard: int, db: InterviewDatabase, indexes: list):
+    for name, definition in indexes:
+        started = time.perf_counter()
+        db.create_index_concurrently(name, definition)
+        print(f"[shard {shard}] {name} ready ({time.perf_counter() - started:.1f}s)")
+
+
+def migrate_search(shard: int, db: InterviewDatabase, batch_size: int):
+    db.prepare_search_vector()
+    last_id, total, started = 0, 0, time.perf_counter()
+    while True:
+        next_id, updated = db.backfill_search_vector(last_id, batch_size)
+        if next_id is None:
+            break
+        last_id, total = next_id, total + updated
+        print(f"[shard {shard}] search_vector filled for {total} messages (through message {last_id})")
+    print(f"[shard {shard}] backfill done in {time.perf_counter() - started:.1f}s")
+    build_indexes(shard, db, SEARCH_INDEXES)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply online schema migrations.")
+    parser.add_argument("migration", choices=["messages", "search", "analytics"])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    shards = shard_databases(open_database())
+    for shard, shard_db in enumerate(shards):
+        if args.migration == "search":
+            migrate_search(shard, shard_db, args.batch_size)
+        else:
+            build_indexes(shard, shard_db, MESSAGE_INDEXES if args.migration == "messages" else ANALYTICS_INDEXES)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Convert stored chat messages between the row-per-message and transcript-per-session layouts.
+
+Usage:
+    python migrate_transcripts.py --to transcript [--batch-size 200] [--delete-source]
+    python migrate_transcripts.py --to rows --delete-source
+
+Safe to interrupt and re-run: messages already in the target layout are not copied again,
+and sessions with messages in both layouts are merged in timestamp order.
+Switch MESSAGE_LAYOUT to the target layout before running with --delete-source so that
+new messages are not written to the layout being drained. With SHARD_DATABASE_URLS set,
+every shard is converted in turn.
+"""
+
+import argparse
+import time
+
+from dotenv import load_dotenv
+from sharding import open_database, shard_databases
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert chat message storage layout.")
+    parser.add_argument("--to", dest="target", choices=["transcript", "rows"], required=True)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--start-after", type=int, default=0, help="Resume after this session_id")
+    parser.add_argument("--delete-source", action="store_true",
+                        help="Remove converted messages from the old layout")
+    args = parser.parse_args()
+
+    total, started = 0, time.perf_counter()
+    for shard, shard_db in enumerate(shard_databases(open_database(message_layout=args.target))):
+        last_id = args.start_after
+        while True:
+            next_id, converted = shard_db.convert_sessions_layout(
+                args.target, last_id, args.batch_size, args.delete_source
+            )
+            if next_id is None:
+                break
+            last_id, total = next_id, total + converted
+            print(f"[shard {shard}] converted {total} sessions (through session_id {last_id})")
+    print(f"Done: {total} sessions converted to '{args.target}' in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
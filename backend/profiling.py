@@ -0,0 +1,137 @@
+"""
+Opt-in request profiling: nested phase timings for a sample of requests plus any slow request.
+
+Enable with PROFILING_ENABLED=1. Code marks phases with `phase("name")` or `@profiled("name")`;
+outside a profiled request these are a single context-variable lookup.
+
+Configuration:
+    PROFILE_SAMPLE_RATE   fraction of requests recorded regardless of latency (default 0.01)
+    SLOW_REQUEST_MS       requests at or above this latency are always recorded (default 1000)
+    PROFILE_BUFFER_SIZE   how many recent profiles to keep in memory (default 200)
+"""
+
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import functools
+import inspect
+import os
+import random
+import time
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.01"))
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "200"))
+
+# Ring buffer of finished profiles, newest last
+recent_profiles: deque = deque(maxlen=PROFILE_BUFFER_SIZE)
+
+_current_span: ContextVar = ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "started", "duration_ms", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.duration_ms = None
+        self.children = []
+
+    def finish(self):
+        self.duration_ms = (time.perf_counter() - self.started) * 1000
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "ms": round(self.duration_ms or 0, 3),
+            "children": [child.to_dict() for child in self.children],
+        }
+
+    def phase_totals(self, totals: dict = None) -> dict:
+        """Total milliseconds per phase name across the whole tree."""
+        totals = {} if totals is None else totals
+        for child in self.children:
+            totals[child.name] = round(totals.get(child.name, 0) + (child.duration_ms or 0), 3)
+            child.phase_totals(totals)
+        return totals
+
+
+@contextmanager
+def phase(name: str):
+    """Time a block as a child of the current span. No-op outside a profiled request."""
+    parent = _current_span.get()
+    if parent is None:
+        yield
+        return
+    span = Span(name)
+    parent.children.append(span)
+    token = _current_span.set(span)
+    try:
+        yield
+    finally:
+        span.finish()
+        _current_span.reset(token)
+
+
+def profiled(name: str):
+    """Decorator form of phase()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return fn(*args, **kwargs)
+            with phase(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def profile_methods(prefix: str):
+    """Class decorator: wrap every public method (except generators) in a phase named prefix.method."""
+    def decorator(cls):
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith("_") or not inspect.isfunction(value) or inspect.isgeneratorfunction(value):
+                continue
+            setattr(cls, attr, profiled(f"{prefix}.{attr}")(value))
+        return cls
+    return decorator
+
+
+class ProfilingMiddleware:
+    """ASGI middleware recording sampled and slow requests into recent_profiles."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        sampled = random.random() < PROFILE_SAMPLE_RATE
+        root = Span(f"{scope['method']} {scope['path']}")
+        status = {}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        token = _current_span.set(root)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_span.reset(token)
+            root.finish()
+            if sampled or root.duration_ms >= SLOW_REQUEST_MS:
+                recent_profiles.append({
+                    "request": root.name,
+                    "status": status.get("code"),
+                    "ms": round(root.duration_ms, 3),
+                    "reason": "slow" if root.duration_ms >= SLOW_REQUEST_MS else "sampled",
+                    "recorded_at": datetime.now(timezone.utc).isoformat(),
+                    "phases": root.phase_totals(),
+                    "tree": root.to_dict(),
+                })
@@ -0,0 +1,203 @@
+"""
+Re-score every completed interview session offline and store the results in session_scores.
+
+Run after tuning TECHNICAL_AREAS / BEHAVIORAL_AREAS / MIXED_AREAS or the analysis prompt
+(which changes SCORING_VERSION), so dashboards pick up the new scores without a live
+gpt-4o call per reload.
+
+Usage:
+    python rescore_sessions.py --mode keyword [--workers 8]
+    python rescore_sessions.py --mode ai [--concurrency 16]
+
+Progress is checkpointed after every batch; re-running resumes where the last run stopped.
+Sessions already scored with the current SCORING_VERSION are skipped. Inline per-answer
+scores are used wherever a session has them, in both modes. Sessions whose AI pass fails
+are not stored (the dashboard scores them live); re-run with --restart to retry them.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from openai import AsyncOpenAI
+
+from analysis import (
+    SCORING_VERSION, area_config_for, build_analysis_prompt, chunk_qa_pairs, extract_qa_pairs, llm_usage,
+    merge_area_scores, parse_analysis_areas, score_session_inline, score_session_keywords
+)
+from database import InterviewDatabase
+from sharding import open_database, shard_databases
+
+
+class Checkpoint:
+    """Last processed session_id per shard, persisted to a small JSON file."""
+
+    def __init__(self, path: str, restart: bool = False):
+        self.path = path
+        self.state = {"scoring_version": SCORING_VERSION, "shards": {}}
+        if not restart and os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            # A checkpoint from an older scoring version doesn't apply to this run
+            if saved.get("scoring_version") == SCORING_VERSION:
+                self.state = saved
+
+    def last_session_id(self, shard: int) -> int:
+        return self.state["shards"].get(str(shard), 0)
+
+    def save(self, shard: int, session_id: int):
+        self.state["shards"][str(shard)] = session_id
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+
+class Progress:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sessions = 0
+        self.failed = 0
+
+    def report(self, shard: int, batch_size: int, batch_seconds: float, last_session_id: int):
+        self.sessions += batch_size
+        elapsed = time.perf_counter() - self.started
+        print(
+            f"[shard {shard}] {self.sessions} sessions scored through {last_session_id} | "
+            f"batch {batch_size / max(batch_seconds, 1e-9):.1f}/s | overall {self.sessions / max(elapsed, 1e-9):.1f}/s"
+        )
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        print(
+            f"Done: {self.sessions} sessions in {elapsed:.1f}s "
+            f"({self.sessions / max(elapsed, 1e-9):.1f} sessions/s, {self.failed} failed and were not stored)"
+        )
+
+
+async def _analyze_chunk_ai(client: AsyncOpenAI, semaphore: asyncio.Semaphore, qa_pairs: list,
+                            area_config: list) -> tuple:
+    """(area scores, usage) for one chunk of Q&A pairs."""
+    async with semaphore:
+        started = time.perf_counter()
+        response = await client.chat.completions.create(
+            model="gpt-4o",
+            messages=[{"role": "user", "content": build_analysis_prompt(qa_pairs, area_config)}],
+            temperature=0.3,
+            max_tokens=800
+        )
+        usage = llm_usage("gpt-4o", response, started)
+    return parse_analysis_areas(response.choices[0].message.content, area_config), usage
+
+
+def _score_session_local(session: dict) -> dict:
+    """Inline scores when the session has them, else keywords (no LLM call)."""
+    return score_session_inline(session) or score_session_keywords(session)
+
+
+async def _score_session_ai(client: AsyncOpenAI, semaphore: asyncio.Semaphore, session: dict,
+                            progress: Progress, usage_log: list) -> Optional[dict]:
+    """Inline, else AI, else (no Q&A pairs) keyword scores. None if the AI pass failed.
+
+    The usage of each completed AI call is appended to usage_log.
+    """
+    inline = score_session_inline(session)
+    if inline:
+        return inline
+    area_config = area_config_for(session.get("interview_type"))
+    qa_pairs = extract_qa_pairs([session])
+    if not qa_pairs:
+        return score_session_keywords(session)
+    chunks = chunk_qa_pairs(qa_pairs)
+    try:
+        results = await asyncio.gather(
+            *(_analyze_chunk_ai(client, semaphore, c, area_config) for c in chunks), return_exceptions=True
+        )
+        for result in results:
+            if not isinstance(result, BaseException):
+                usage_log.append({"user_id": session["user_id"], "session_id": session["session_id"], **result[1]})
+        failed = next((result for result in results if isinstance(result, BaseException)), None)
+        if failed:
+            raise failed
+        chunk_areas = [areas for areas, _ in results]
+        areas = merge_area_scores([(len(c), a) for c, a in zip(chunks, chunk_areas)], area_config)
+    except Exception as e:
+        print(f"session {session['session_id']}: AI scoring failed ({e}); not storing a score")
+        areas = []
+    if not areas:
+        progress.failed += 1
+        return None
+    return {
+        "session_id": session["session_id"],
+        "user_id": session["user_id"],
+        "method": "ai",
+        "areas": areas,
+        "qa_count": len(qa_pairs),
+    }
+
+
+def rescore_keyword(shard: int, db: InterviewDatabase, args, checkpoint: Checkpoint, progress: Progress):
+    """CPU-bound inline/keyword scoring fanned out across a process pool."""
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for batch in db.iter_completed_sessions(checkpoint.last_session_id(shard), args.batch_size, SCORING_VERSION):
+            started = time.perf_counter()
+            chunksize = max(1, len(batch) // (args.workers * 4))
+            scores = list(pool.map(_score_session_local, batch, chunksize=chunksize))
+            db.save_session_scores(scores, SCORING_VERSION)
+            checkpoint.save(shard, batch[-1]["session_id"])
+            progress.report(shard, len(batch), time.perf_counter() - started, batch[-1]["session_id"])
+
+
+async def rescore_ai(shard: int, db: InterviewDatabase, args, checkpoint: Checkpoint, progress: Progress):
+    """LLM scoring with at most --concurrency requests in flight; the next batch is fetched meanwhile."""
+    client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    semaphore = asyncio.Semaphore(args.concurrency)
+    batches = db.iter_completed_sessions(checkpoint.last_session_id(shard), args.batch_size, SCORING_VERSION)
+    next_batch = asyncio.create_task(asyncio.to_thread(next, batches, None))
+    while True:
+        batch = await next_batch
+        if not batch:
+            break
+        next_batch = asyncio.create_task(asyncio.to_thread(next, batches, None))
+        started = time.perf_counter()
+        usage_log = []
+        scores = await asyncio.gather(*(_score_session_ai(client, semaphore, s, progress, usage_log) for s in batch))
+        stored = [score for score in scores if score is not None]
+        await asyncio.to_thread(db.save_session_scores, stored, SCORING_VERSION)
+        await asyncio.to_thread(db.record_llm_usage_batch, "rescore.analysis", usage_log)
+        checkpoint.save(shard, batch[-1]["session_id"])
+        progress.report(shard, len(batch), time.perf_counter() - started, batch[-1]["session_id"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score all completed interview sessions.")
+    parser.add_argument("--mode", choices=["keyword", "ai"], default="keyword")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Processes for --mode keyword")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent LLM calls for --mode ai")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--checkpoint", default="rescore_checkpoint.json")
+    parser.add_argument("--restart", action="store_true", help="Ignore any existing checkpoint")
+    args = parser.parse_args()
+
+    shards = shard_databases(open_database())
+    checkpoint = Checkpoint(args.checkpoint, restart=args.restart)
+    progress = Progress()
+    print(f"Scoring version {SCORING_VERSION}, mode {args.mode}")
+    for shard, shard_db in enumerate(shards):
+        if args.mode == "keyword":
+            rescore_keyword(shard, shard_db, args, checkpoint, progress)
+        else:
+            asyncio.run(rescore_ai(shard, shard_db, args, checkpoint, progress))
+    progress.summary()
+
+
+if __name__ == "__main__":
+    main()
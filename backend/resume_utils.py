@@ -0,0 +1,194 @@
+"""
+Resume and job description preprocessing: normalization, content hashing and
+compact, token-bounded digests for the interviewer system prompt.
+"""
+
+from functools import lru_cache
+import hashlib
+import os
+import re
+import unicodedata
+
+MAX_RESUME_CHARS = int(os.getenv("MAX_RESUME_CHARS", "50000"))
+MAX_JOB_DESCRIPTION_CHARS = int(os.getenv("MAX_JOB_DESCRIPTION_CHARS", "20000"))
+RESUME_DIGEST_TOKENS = int(os.getenv("RESUME_DIGEST_TOKENS", "600"))
+JOB_DESCRIPTION_DIGEST_TOKENS = int(os.getenv("JOB_DESCRIPTION_DIGEST_TOKENS", "400"))
+
+# Rough English average; good enough to bound prompt size without a tokenizer
+CHARS_PER_TOKEN = 4
+
+SECTION_NAMES = [
+    "summary", "profile", "objective", "experience", "work experience", "professional experience",
+    "employment", "education", "skills", "technical skills", "technologies", "projects",
+    "certifications", "awards", "publications", "responsibilities", "requirements",
+    "qualifications", "preferred qualifications", "about the role", "about you", "what you'll do",
+]
+SKILL_SECTIONS = {"skills", "technical skills", "technologies", "requirements", "qualifications",
+                  "preferred qualifications"}
+ROLE_SECTIONS = {"experience", "work experience", "professional experience", "employment"}
+
+_YEAR_RE = re.compile(r"\b(19|20)\d{2}\b|\bpresent\b", re.IGNORECASE)
+_BULLET_RE = re.compile(r"^[\-\*•●▪–]+\s*")
+_SKILL_SPLIT_RE = re.compile(r"[,;|•]")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize unicode, line endings and whitespace so equivalent uploads hash the same."""
+    text = unicodedata.normalize("NFKC", text or "")
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    # Drop control characters left behind by PDF extraction (keep newlines and tabs)
+    text = "".join(ch for ch in text if ch in "\n\t" or unicodedata.category(ch)[0] != "C")
+    lines = [re.sub(r"[ \t]+", " ", line).strip() for line in text.split("\n")]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def content_hash(normalized_text: str) -> str:
+    """SHA-256 of already-normalized text."""
+    return hashlib.sha256(normalized_text.encode("utf-8")).hexdigest()
+
+
+def _section_name(line: str):
+    """Return the canonical section name if the line looks like a heading, else None."""
+    candidate = line.rstrip(":").strip().lower()
+    if candidate in SECTION_NAMES:
+        return candidate
+    if len(line) <= 40 and line.isupper() and not line.endswith("."):
+        return candidate
+    return None
+
+
+def _split_sections(text: str) -> list[tuple]:
+    """Split text into (section_name, lines) in document order. Text before any heading is 'header'."""
+    sections = [("header", [])]
+    for raw in text.split("\n"):
+        line = _BULLET_RE.sub("", raw).strip()
+        if not line:
+            continue
+        # Inline headings such as "Skills: Python, SQL"
+        head, sep, tail = line.partition(":")
+        if sep and tail.strip() and _section_name(head) in SKILL_SECTIONS:
+            sections.append((_section_name(head), [tail.strip()]))
+            continue
+        name = _section_name(line)
+        # An all-caps first line is usually the candidate's name, not a heading
+        if name and name not in SECTION_NAMES and len(sections) == 1 and not sections[0][1]:
+            name = None
+        if name:
+            sections.append((name, []))
+        else:
+            sections[-1][1].append(line)
+    return [(name, lines) for name, lines in sections if lines or name != "header"]
+
+
+def _truncate(line: str, limit: int = 160) -> str:
+    return line if len(line) <= limit else line[:limit - 3].rstrip() + "..."
+
+
+_METRIC_RE = re.compile(r"\d|%|\$")
+# Sections whose bullets carry the accomplishments an interviewer will probe
+DETAIL_SECTIONS = ROLE_SECTIONS | {"projects", "summary", "profile", "responsibilities", "about the role",
+                                   "what you'll do"}
+
+
+def _rank_line(name: str, index: int, line: str) -> float:
+    """Higher is more worth keeping: lead lines, quantified results, experience/project bullets."""
+    score = 0.0
+    if index == 0:
+        score += 3
+    if name in DETAIL_SECTIONS:
+        score += 2
+    if _METRIC_RE.search(line):
+        score += 2
+    if len(line) >= 30:
+        score += 1
+    # Earlier bullets in a section tend to be the more important ones
+    return score - index * 0.05
+
+
+def _fit_core(parts: list[str], max_chars: int) -> str:
+    """Join parts in priority order, trimming from the end until the budget fits."""
+    digest = ""
+    for part in parts:
+        candidate = f"{digest}\n{part}" if digest else part
+        if len(candidate) > max_chars:
+            remaining = max_chars - len(digest) - 1
+            if remaining > 40:
+                digest = (f"{digest}\n" if digest else "") + part[:remaining - 3].rstrip() + "..."
+            break
+        digest = candidate
+    return digest
+
+
+@lru_cache(maxsize=256)
+def _build_digest(normalized: str, max_tokens: int) -> str:
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(normalized) <= max_chars:
+        return normalized
+
+    sections = _split_sections(normalized)
+    skills, skill_keys, roles, candidates, seen = [], set(), [], [], set()
+    skills_chars = len("Skills:")
+    for position, (name, lines) in enumerate(sections):
+        if name in SKILL_SECTIONS:
+            for line in lines:
+                for item in _SKILL_SPLIT_RE.split(line):
+                    item = item.strip(" .")
+                    if not item or len(item) > 40 or item.lower() in skill_keys:
+                        continue
+                    # Items past what the Skills line can hold would only be trimmed away
+                    if skills_chars + len(item) + 2 > max_chars:
+                        continue
+                    skill_keys.add(item.lower())
+                    skills.append(item)
+                    skills_chars += len(item) + 2
+            continue
+        for index, line in enumerate(lines):
+            # Pasted documents often repeat lines (page headers, duplicated sections)
+            if line.lower() in seen:
+                continue
+            seen.add(line.lower())
+            if name in ROLE_SECTIONS and _YEAR_RE.search(line):
+                roles.append(_truncate(line))
+            else:
+                candidates.append((_rank_line(name, index, line), position, index, _truncate(line)))
+
+    parts = []
+    section_titles = list(dict.fromkeys(name.title() for name, _ in sections if name != "header"))
+    if section_titles:
+        parts.append("Sections: " + ", ".join(section_titles))
+    if skills:
+        parts.append("Skills: " + ", ".join(skills))
+    if roles:
+        parts.append("Roles:\n" + "\n".join(f"- {r}" for r in roles))
+    digest = _fit_core(parts, max_chars)
+
+    # Fill what's left of the budget with the best-ranked lines, skipping any that don't fit
+    remaining = max_chars - len(digest) - (len("\nHighlights:") if digest else len("Highlights:"))
+    chosen, opened = [], set()
+    for _, position, index, line in sorted(candidates, key=lambda c: (-c[0], c[1], c[2])):
+        cost = len(line) + 3
+        if position not in opened:
+            cost += len(sections[position][0]) + 2
+        if cost > remaining:
+            continue
+        remaining -= cost
+        opened.add(position)
+        chosen.append((position, index, line))
+    if chosen:
+        # Present highlights in document order, grouped under their section
+        blocks, current = [], None
+        for position, _, line in sorted(chosen):
+            if position != current:
+                blocks.append(f"{sections[position][0].title()}:")
+                current = position
+            blocks.append(f"- {line}")
+        digest = (f"{digest}\n" if digest else "") + "Highlights:\n" + "\n".join(blocks)
+    return digest or _truncate(normalized, max_chars)
+
+
+def build_digest(text: str, max_tokens: int) -> str:
+    """Compact summary (sections, skills, roles, top-ranked bullets) bounded to roughly max_tokens. Cached per content."""
+    normalized = normalize_text(text)
+    if not normalized:
+        return ""
+    return _build_digest(normalized, max_tokens)
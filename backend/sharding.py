@@ -0,0 +1,622 @@
+"""
+Horizontal sharding of user data across several PostgreSQL databases.
+
+Each user's rows (profile, sessions, messages, resumes) live together on one shard.
+A small directory database maps usernames and user IDs to shards and allocates
+user and session IDs so they stay unique across shards.
+
+Configuration:
+    SHARD_DATABASE_URLS   comma-separated shard URLs (order defines shard numbers)
+    SHARD_DIRECTORY_URL   directory database (defaults to the first shard)
+    SHARD_DIRECTORY_TTL   seconds a process may cache a user's shard (default 5)
+    SHARD_DIRECTORY_CACHE_SIZE  users and sessions whose shard a process remembers (default 100000 each)
+    SHARD_REPLICA_URLS    optional read replicas per shard: shards separated by ',',
+                          replicas of one shard by '|' (e.g. "r0a|r0b,r1a")
+
+For local testing, point the URLs at several databases on one local Postgres
+instance (e.g. .../hireready_s0, .../hireready_s1).
+
+Maintenance:
+    python sharding.py bootstrap          register existing shard-0 users/sessions in the directory
+    python sharding.py status             users per shard
+    python sharding.py move USER_ID SHARD move one user's rows to another shard
+"""
+
+import argparse
+from collections import OrderedDict
+import copy
+import os
+import threading
+import time
+from contextlib import contextmanager, ExitStack
+from typing import List, Dict, Optional
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+
+from database import InterviewDatabase
+from profiling import profile_methods
+
+DIRECTORY_TTL = float(os.getenv("SHARD_DIRECTORY_TTL", "5"))
+DIRECTORY_CACHE_SIZE = int(os.getenv("SHARD_DIRECTORY_CACHE_SIZE", "100000"))
+
+
+class _ShardUnits:
+    """Stands in for the shard list inside a unit of work: a shard's unit is opened on first access."""
+
+    def __init__(self, shards: List[InterviewDatabase], stack: ExitStack):
+        self._shards = shards
+        self._stack = stack
+        self._units: Dict[int, InterviewDatabase] = {}
+
+    def __len__(self):
+        return len(self._shards)
+
+    def __getitem__(self, index: int) -> InterviewDatabase:
+        if index not in self._units:
+            self._units[index] = self._stack.enter_context(self._shards[index].unit_of_work())
+        return self._units[index]
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self._shards)))
+
+
+@profile_methods("shards")
+class ShardedInterviewDatabase:
+    """Routes InterviewDatabase calls to the shard that owns the user."""
+
+    def __init__(self, shard_urls: List[str] = None, directory_url: str = None,
+                 cache_size: int = DIRECTORY_CACHE_SIZE):
+        if shard_urls is None:
+            shard_urls = [u.strip() for u in os.getenv("SHARD_DATABASE_URLS", "").split(",") if u.strip()]
+        if not shard_urls:
+            raise ValueError("SHARD_DATABASE_URLS environment variable is not set.")
+        replica_groups = [g for g in os.getenv("SHARD_REPLICA_URLS", "").split(",")]
+        replica_groups += [""] * (len(shard_urls) - len(replica_groups))
+        self.shards = [
+            InterviewDatabase(url, replica_urls=[r.strip() for r in group.split("|") if r.strip()])
+            for url, group in zip(shard_urls, replica_groups)
+        ]
+        self.directory_url = directory_url or os.getenv("SHARD_DIRECTORY_URL") or shard_urls[0]
+        # LRUs, most recently used last: user_id -> (shard, moving, fetched_at);
+        # session_id -> user_id (never changes)
+        self.cache_size = cache_size
+        self._cache_lock = threading.Lock()
+        self._user_cache: OrderedDict = OrderedDict()
+        self._session_owner: OrderedDict = OrderedDict()
+        self.init_directory()
+
+    @contextmanager
+    def unit_of_work(self):
+        """Unit of work on every shard the block touches, committed together at the end.
+
+        Directory writes are not part of it, and shards commit one after another
+        (there is no two-phase commit), which is fine while a request stays on one user's shard.
+        """
+        with ExitStack() as stack:
+            unit = copy.copy(self)
+            unit.shards = _ShardUnits(self.shards, stack)
+            yield unit
+
+    def get_directory_connection(self):
+        return psycopg2.connect(self.directory_url)
+
+    def init_directory(self):
+        """Create directory tables if they don't exist."""
+        conn = self.get_directory_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS shard_users (
+                user_id SERIAL PRIMARY KEY,
+                username TEXT UNIQUE NOT NULL,
+                shard INTEGER NOT NULL,
+                moving BOOLEAN NOT NULL DEFAULT FALSE
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS shard_sessions (
+                session_id SERIAL PRIMARY KEY,
+                user_id INTEGER NOT NULL REFERENCES shard_users(user_id) ON DELETE CASCADE
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_shard_sessions_user ON shard_sessions (user_id)")
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+    # ─── Directory Lookups ─────────────────────────────────────────────────
+
+    def _cache_get(self, cache: OrderedDict, key):
+        with self._cache_lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def _cache_put(self, cache: OrderedDict, key, value):
+        with self._cache_lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+
+    def _cache_drop(self, cache: OrderedDict, key):
+        with self._cache_lock:
+            cache.pop(key, None)
+
+    def _lookup_user(self, user_id: int) -> Optional[tuple]:
+        """Return (shard, moving) for a user, cached for DIRECTORY_TTL seconds."""
+        cached = self._cache_get(self._user_cache, user_id)
+        if cached and time.monotonic() - cached[2] < DIRECTORY_TTL:
+            return cached[0], cached[1]
+        conn = self.get_directory_connection()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute("SELECT shard, moving FROM shard_users WHERE user_id = %s", (user_id,))
+        row = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        if not row:
+            self._cache_drop(self._user_cache, user_id)
+            return None
+        self._cache_put(self._user_cache, user_id, (row['shard'], row['moving'], time.monotonic()))
+        return row['shard'], row['moving']
+
+    def _lookup_username(self, username: str) -> Optional[Dict]:
+        conn = self.get_directory_connection()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute("SELECT user_id, shard FROM shard_users WHERE username = %s", (username,))
+        row = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        return dict(row) if row else None
+
+    def _user_shard(self, user_id: int, write: bool = False) -> Optional[InterviewDatabase]:
+        entry = self._lookup_user(user_id)
+        if entry is None:
+            return None
+        shard, moving = entry
+        if write and moving:
+            raise RuntimeError("Account is being migrated, please try again shortly")
+        return self.shards[shard]
+
+    def _session_user(self, session_id: int) -> Optional[int]:
+        user_id = self._cache_get(self._session_owner, session_id)
+        if user_id is None:
+            conn = self.get_directory_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT user_id FROM shard_sessions WHERE session_id = %s", (session_id,))
+            row = cursor.fetchone()
+            cursor.close()
+            conn.close()
+            if not row:
+                return None
+            user_id = row[0]
+            self._cache_put(self._session_owner, session_id, user_id)
+        return user_id
+
+    def _session_shard(self, session_id: int, write: bool = False) -> Optional[InterviewDatabase]:
+        user_id = self._session_user(session_id)
+        return self._user_shard(user_id, write) if user_id is not None else None
+
+    # ─── User Management ───────────────────────────────────────────────────
+
+    def create_user(self, username: str, password: str) -> tuple:
+        """Create a new user on a shard picked at signup. Returns (user_id, success, message)."""
+        existing = self._lookup_username(username)
+        if existing:
+            # Legacy accounts without a password are completed on their own shard
+            return self.shards[existing['shard']].create_user(username, password)
+        conn = self.get_directory_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT nextval(pg_get_serial_sequence('shard_users', 'user_id'))")
+            user_id = cursor.fetchone()[0]
+            shard = user_id % len(self.shards)
+            cursor.execute(
+                "INSERT INTO shard_users (user_id, username, shard) VALUES (%s, %s, %s)",
+                (user_id, username, shard)
+            )
+            conn.commit()
+        except psycopg2.IntegrityError:
+            conn.rollback()
+            return None, False, "Username already exists"
+        finally:
+            cursor.close()
+            conn.close()
+        created_id, success, message = self.shards[shard].create_user(username, password, user_id=user_id)
+        if not success:
+            self._delete_directory_user(user_id)
+        return created_id, success, message
+
+    def authenticate_user(self, username: str, password: str) -> tuple:
+        existing = self._lookup_username(username)
+        if not existing:
+            return None, False, "Username not found"
+        return self.shards[existing['shard']].authenticate_user(username, password)
+
+    def get_user_id(self, username: str) -> Optional[int]:
+        existing = self._lookup_username(username)
+        return existing['user_id'] if existing else None
+
+    def get_user_profile(self, user_id: int) -> Optional[Dict]:
+        shard = self._user_shard(user_id)
+        return shard.get_user_profile(user_id) if shard else None
+
+    def update_username(self, user_id: int, new_username: str) -> tuple:
+        shard = self._user_shard(user_id, write=True)
+        if not shard:
+            return False, "User not found"
+        # Claim the name in the directory first; its unique constraint is the global one
+        conn = self.get_directory_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT username FROM shard_users WHERE user_id = %s", (user_id,))
+            old_username = cursor.fetchone()[0]
+            cursor.execute("UPDATE shard_users SET username = %s WHERE user_id = %s", (new_username, user_id))
+            conn.commit()
+        except psycopg2.IntegrityError:
+            conn.rollback()
+            return False, "Username already taken"
+        finally:
+            cursor.close()
+            conn.close()
+        success, message = shard.update_username(user_id, new_username)
+        if not success:
+            self._set_directory_username(user_id, old_username)
+        return success, message
+
+    def update_password(self, user_id: int, current_password: str, new_password: str) -> tuple:
+        shard = self._user_shard(user_id, write=True)
+        if not shard:
+            return False, "User not found"
+        return shard.update_password(user_id, current_password, new_password)
+
+    def delete_user(self, user_id: int) -> tuple:
+        """Disable the account on its shard; the directory entry is removed once the purge finishes."""
+        shard = self._user_shard(user_id, write=True)
+        if not shard:
+            return False, "User not found"
+        return shard.delete_user(user_id)
+
+    def get_token_version(self, user_id: int) -> int:
+        shard = self._user_shard(user_id)
+        return shard.get_token_version(user_id) if shard else 0
+
+    def get_token_versions_since(self, since=None) -> List[Dict]:
+        rows = [row for shard in self.shards for row in shard.get_token_versions_since(since)]
+        return sorted(rows, key=lambda row: row['token_version_updated_at'])
+
+    def get_deletion_jobs(self, limit: int = 50) -> List[Dict]:
+        """Most recent deletion jobs across all shards."""
+        jobs = [job for shard in self.shards for job in shard.get_deletion_jobs(limit)]
+        return sorted(jobs, key=lambda job: job['requested_at'], reverse=True)[:limit]
+
+    def forget_user(self, user_id: int):
+        """Drop a fully purged user from the directory, freeing the username."""
+        self._delete_directory_user(user_id)
+
+    def _set_directory_username(self, user_id: int, username: str):
+        conn = self.get_directory_connection()
+        cursor = conn.cursor()
+        cursor.execute("UPDATE shard_users SET username = %s WHERE user_id = %s", (username, user_id))
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+    def _delete_directory_user(self, user_id: int):
+        conn = self.get_directory_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM shard_users WHERE user_id = %s", (user_id,))
+        conn.commit()
+        cursor.close()
+        conn.close()
+        self._cache_drop(self._user_cache, user_id)
+
+    # ─── Interview Sessions and Messages ───────────────────────────────────
+
+    def create_session(self, user_id: int, interview_type: str,
+                       difficulty: str, num_questions: int) -> int:
+        shard = self._user_shard(user_id, write=True)
+        if not shard:
+            raise ValueError(f"Unknown user {user_id}")
+        conn = self.get_directory_connection()
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO shard_sessions (user_id) VALUES (%s) RETURNING session_id", (user_id,))
+        session_id = cursor.fetchone()[0]
+        conn.commit()
+        cursor.close()
+        conn.close()
+        self._cache_put(self._session_owner, session_id, user_id)
+        return shard.create_session(user_id, interview_type, difficulty, num_questions, session_id=session_id)
+
+    def update_session_status(self, session_id: int, status: str):
+        shard = self._session_shard(session_id, write=True)
+        if shard:
+            shard.update_session_status(session_id, status)
+
+    def save_message(self, session_id: int, role: str, content: str, metadata: Dict = None):
+        shard = self._session_shard(session_id, write=True)
+        if not shard:
+            raise ValueError(f"Unknown session {session_id}")
+        shard.save_message(session_id, role, content, metadata)
+
+    def get_session_messages(self, session_id: int) -> List[Dict]:
+        shard = self._session_shard(session_id)
+        return shard.get_session_messages(session_id) if shard else []
+
+    def get_session_details(self, session_id: int) -> Optional[Dict]:
+        shard = self._session_shard(session_id)
+        return shard.get_session_details(session_id) if shard else None
+
+    def get_user_sessions(self, user_id: int, limit: int = 10) -> List[Dict]:
+        shard = self._user_shard(user_id)
+        return shard.get_user_sessions(user_id, limit) if shard else []
+
+    def get_user_stats(self, user_id: int) -> Dict:
+        shard = self._user_shard(user_id)
+        if not shard:
+            return {"total_sessions": 0, "completed_sessions": 0, "by_difficulty": {}}
+        return shard.get_user_stats(user_id)
+
+    def get_completed_sessions_with_messages(self, user_id: int, limit: int = 30) -> List[Dict]:
+        shard = self._user_shard(user_id)
+        return shard.get_completed_sessions_with_messages(user_id, limit) if shard else []
+
+    def get_completed_sessions(self, user_id: int, limit: int = 30) -> List[Dict]:
+        shard = self._user_shard(user_id)
+        return shard.get_completed_sessions(user_id, limit) if shard else []
+
+    def get_sessions_messages(self, user_id: int, session_ids: List[int]) -> Dict[int, List[Dict]]:
+        shard = self._user_shard(user_id)
+        return shard.get_sessions_messages(user_id, session_ids) if shard else {}
+
+    def save_session_scores(self, scores: List[Dict], scoring_version: str):
+        """Store memoized scores on each user's shard, skipping users being moved (they are rescored later)."""
+        by_shard = {}
+        for row in scores:
+            try:
+                shard = self._user_shard(row["user_id"], write=True)
+            except RuntimeError:
+                continue
+            if shard:
+                by_shard.setdefault(id(shard), (shard, []))[1].append(row)
+        for shard, rows in by_shard.values():
+            shard.save_session_scores(rows, scoring_version)
+
+    def get_session_scores(self, user_id: int, session_ids: List[int], scoring_version: str) -> Dict[int, Dict]:
+        shard = self._user_shard(user_id)
+        return shard.get_session_scores(user_id, session_ids, scoring_version) if shard else {}
+
+    def record_llm_usage(self, user_id: int, session_id: Optional[int], purpose: str, model: str,
+                         prompt_tokens: int, cached_tokens: int, completion_tokens: int, latency_ms: int):
+        shard = self._user_shard(user_id, write=True)
+        if shard:
+            shard.record_llm_usage(user_id, session_id, purpose, model,
+                                   prompt_tokens, cached_tokens, completion_tokens, latency_ms)
+
+    def record_llm_usage_batch(self, purpose: str, rows: List[Dict]):
+        """Store usage on each user's shard, dropping rows for users being moved."""
+        by_shard = {}
+        for row in rows:
+            try:
+                shard = self._user_shard(row["user_id"], write=True)
+            except RuntimeError:
+                continue
+            if shard:
+                by_shard.setdefault(id(shard), (shard, []))[1].append(row)
+        for shard, shard_rows in by_shard.values():
+            shard.record_llm_usage_batch(purpose, shard_rows)
+
+    def get_llm_usage_summary(self, hours: int = 24) -> List[Dict]:
+        merged = {}
+        for shard in self.shards:
+            for row in shard.get_llm_usage_summary(hours):
+                key = (row['purpose'], row['model'])
+                if key not in merged:
+                    merged[key] = row
+                else:
+                    for column in ("calls", "prompt_tokens", "cached_tokens", "completion_tokens", "latency_ms"):
+                        merged[key][column] += row[column]
+        return [merged[key] for key in sorted(merged)]
+
+    ANALYTICS_COUNTERS = (
+        "sessions_started", "sessions_completed", "sessions_abandoned", "turns",
+        "llm_calls", "llm_latency_ms", "prompt_tokens", "cached_tokens",
+    )
+
+    def get_analytics_daily(self, days: int = 30) -> List[Dict]:
+        merged = {}
+        for shard in self.shards:
+            for row in shard.get_analytics_daily(days):
+                key = (row['day'], row['interview_type'], row['difficulty'])
+                if key not in merged:
+                    merged[key] = row
+                else:
+                    for column in self.ANALYTICS_COUNTERS:
+                        merged[key][column] += row[column]
+        return [merged[key] for key in sorted(merged)]
+
+    def get_analytics_refreshed_through(self):
+        """The oldest shard watermark: every shard is complete up to this point."""
+        watermarks = [shard.get_analytics_refreshed_through() for shard in self.shards]
+        return None if None in watermarks else min(watermarks)
+
+    def search_messages(self, user_id: int, query: str, limit: int = 20, offset: int = 0) -> List[Dict]:
+        shard = self._user_shard(user_id)
+        return shard.search_messages(user_id, query, limit, offset) if shard else []
+
+    # ─── Resumes ───────────────────────────────────────────────────────────
+
+    def upload_resume(self, user_id: int, filename: str, content: str) -> tuple:
+        shard = self._user_shard(user_id, write=True)
+        if not shard:
+            return None, False, "User not found"
+        return shard.upload_resume(user_id, filename, content)
+
+    def get_user_resumes(self, user_id: int) -> List[Dict]:
+        shard = self._user_shard(user_id)
+        return shard.get_user_resumes(user_id) if shard else []
+
+    def get_resume(self, user_id: int, resume_id: int) -> Optional[Dict]:
+        shard = self._user_shard(user_id)
+        return shard.get_resume(user_id, resume_id) if shard else None
+
+    def delete_resume(self, user_id: int, resume_id: int) -> tuple:
+        shard = self._user_shard(user_id, write=True)
+        if not shard:
+            return False, "Resume not found or not authorized to delete"
+        return shard.delete_resume(user_id, resume_id)
+
+    # ─── Maintenance ───────────────────────────────────────────────────────
+
+    def bootstrap_directory(self, shard: int = 0) -> tuple:
+        """Register users and sessions that already exist on a shard (e.g. the pre-sharding database).
+
+        Returns (users_registered, sessions_registered).
+        """
+        source = self.shards[shard].get_connection()
+        cursor = source.cursor()
+        cursor.execute("SELECT user_id, username FROM users")
+        users = cursor.fetchall()
+        cursor.execute("SELECT session_id, user_id FROM interview_sessions")
+        sessions = cursor.fetchall()
+        cursor.close()
+        source.close()
+
+        conn = self.get_directory_connection()
+        cursor = conn.cursor()
+        for user_id, username in users:
+            cursor.execute("""
+                INSERT INTO shard_users (user_id, username, shard) VALUES (%s, %s, %s)
+                ON CONFLICT DO NOTHING
+            """, (user_id, username, shard))
+        for session_id, user_id in sessions:
+            cursor.execute(
+                "INSERT INTO shard_sessions (session_id, user_id) VALUES (%s, %s) ON CONFLICT DO NOTHING",
+                (session_id, user_id)
+            )
+        # Make sure newly allocated IDs start above the imported ones
+        for table, column in (("shard_users", "user_id"), ("shard_sessions", "session_id")):
+            cursor.execute(f"""
+                SELECT setval(pg_get_serial_sequence('{table}', '{column}'),
+                              GREATEST((SELECT COALESCE(MAX({column}), 0) FROM {table}), 1))
+            """)
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return len(users), len(sessions)
+
+    def shard_user_counts(self) -> Dict[int, int]:
+        conn = self.get_directory_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT shard, COUNT(*) FROM shard_users GROUP BY shard ORDER BY shard")
+        counts = {shard: 0 for shard in range(len(self.shards))}
+        counts.update(dict(cursor.fetchall()))
+        cursor.close()
+        conn.close()
+        return counts
+
+    def _set_directory_entry(self, user_id: int, shard: int, moving: bool):
+        conn = self.get_directory_connection()
+        cursor = conn.cursor()
+        cursor.execute("UPDATE shard_users SET shard = %s, moving = %s WHERE user_id = %s", (shard, moving, user_id))
+        conn.commit()
+        cursor.close()
+        conn.close()
+        self._cache_drop(self._user_cache, user_id)
+
+    def move_user(self, user_id: int, target: int, log=print):
+        """Move all of a user's rows to another shard.
+
+        Writes for the user are rejected while the move runs. Each wait of
+        DIRECTORY_TTL lets other processes' cached directory entries expire
+        before the next step, so no process writes to a shard that is being
+        copied from or reads from one that has been purged.
+
+        If the copy fails, the user stays on the source shard and writes resume.
+        Re-running after a failure later on finishes the move: the directory is
+        settled on the owning shard and leftover rows on other shards are purged.
+        """
+        entry = self._lookup_user(user_id)
+        if entry is None:
+            raise ValueError(f"Unknown user {user_id}")
+        source, moving = entry
+        if source == target:
+            if moving:
+                self._set_directory_entry(user_id, target, moving=False)
+                time.sleep(DIRECTORY_TTL)
+            self._purge_stale_copies(user_id, target, log)
+            log(f"user {user_id} already on shard {target}")
+            return
+        self._set_directory_entry(user_id, source, moving=True)
+        time.sleep(DIRECTORY_TTL)
+
+        try:
+            # Rows left on the target by an earlier interrupted attempt would collide with the copy
+            self.shards[target].purge_user(user_id)
+            data = self.shards[source].export_user_data(user_id)
+            self.shards[target].import_user_data(data)
+        except Exception:
+            self._set_directory_entry(user_id, source, moving=False)
+            log(f"copy of user {user_id} to shard {target} failed; user stays on shard {source}")
+            raise
+        copied = {table: len(rows) for table, rows in data.items()}
+        log(f"copied user {user_id} from shard {source} to {target}: {copied}")
+
+        self._set_directory_entry(user_id, target, moving=True)
+        time.sleep(DIRECTORY_TTL)
+        self._set_directory_entry(user_id, target, moving=False)
+        time.sleep(DIRECTORY_TTL)
+
+        purged = self.shards[source].purge_user(user_id)
+        log(f"user {user_id} now on shard {target} ({purged} rows purged from shard {source})")
+
+    def _purge_stale_copies(self, user_id: int, owner: int, log=print):
+        """Purge a user's rows from every shard but the owner (left by an interrupted move)."""
+        for index, shard in enumerate(self.shards):
+            if index != owner:
+                purged = shard.purge_user(user_id)
+                if purged:
+                    log(f"purged {purged} leftover rows of user {user_id} from shard {index}")
+
+def open_database(**kwargs):
+    """The configured database: a shard router when SHARD_DATABASE_URLS is set, else one InterviewDatabase.
+
+    kwargs are passed to InterviewDatabase when unsharded.
+    """
+    if os.getenv("SHARD_DATABASE_URLS"):
+        return ShardedInterviewDatabase()
+    return InterviewDatabase(**kwargs)
+
+
+def shard_databases(db) -> List[InterviewDatabase]:
+    """The per-shard databases behind db, for jobs that work shard by shard ([db] when unsharded)."""
+    return db.shards if isinstance(db, ShardedInterviewDatabase) else [db]
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Shard directory maintenance.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bootstrap = sub.add_parser("bootstrap", help="Register existing users and sessions of a shard")
+    bootstrap.add_argument("--shard", type=int, default=0)
+    sub.add_parser("status", help="Show users per shard")
+    move = sub.add_parser("move", help="Move a user to another shard")
+    move.add_argument("user_id", type=int)
+    move.add_argument("shard", type=int)
+    args = parser.parse_args()
+
+    db = ShardedInterviewDatabase()
+    if args.command == "bootstrap":
+        users, sessions = db.bootstrap_directory(args.shard)
+        print(f"Registered {users} users and {sessions} sessions from shard {args.shard}")
+    elif args.command == "status":
+        for shard, count in db.shard_user_counts().items():
+            print(f"shard {shard}: {count} users")
+    elif args.command == "move":
+        db.move_user(args.user_id, args.shard)
+
+
+if __name__ == "__main__":
+    main()
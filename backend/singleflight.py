@@ -0,0 +1,81 @@
+"""
+In-process request coalescing: concurrent calls with the same key share one execution,
+and completed results can be replayed for a short time (idempotent retries).
+"""
+
+from collections import OrderedDict
+import threading
+import time
+
+
+class KeyReuseError(Exception):
+    """Raised when a key is reused with a different fingerprint (e.g. another request body)."""
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "fingerprint")
+
+    def __init__(self, fingerprint=None):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.fingerprint = fingerprint
+
+
+class SingleFlight:
+    """Coalesce concurrent calls per key and cache successful results for ttl_seconds."""
+
+    def __init__(self, ttl_seconds: float = 0, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._results = OrderedDict()  # key -> (expires_at, result, fingerprint), oldest first
+
+    def do(self, key, fn, cache: bool = True, fingerprint=None):
+        """Return fn()'s result, joining an identical in-flight call or replaying a cached result.
+
+        Errors are shared with callers that joined the same flight but never cached. When
+        a fingerprint is given, joining or replaying a flight started with a different
+        one raises KeyReuseError.
+        """
+        with self._lock:
+            cached = self._results.get(key)
+            if cached and cached[0] > time.monotonic():
+                if cached[2] != fingerprint:
+                    raise KeyReuseError("Key was already used with a different request")
+                return cached[1]
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call(fingerprint)
+            elif call.fingerprint != fingerprint:
+                raise KeyReuseError("Key was already used with a different request")
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is call:
+                    del self._inflight[key]
+                if call.error is None and cache and self.ttl_seconds > 0:
+                    self._results[key] = (time.monotonic() + self.ttl_seconds, call.result, call.fingerprint)
+                    self._results.move_to_end(key)
+                    while len(self._results) > self.max_entries:
+                        self._results.popitem(last=False)
+            call.done.set()
+
+    def forget(self, key):
+        """Drop any cached result and detach an in-flight call so the next caller starts fresh."""
+        with self._lock:
+            self._results.pop(key, None)
+            self._inflight.pop(key, None)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The backend modules import each other as top-level modules (run from backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# analysis.py builds its OpenAI client at import time; tests never call the API
+os.environ.setdefault("OPENAI_API_KEY", "test")
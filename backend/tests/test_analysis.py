@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("dotenv")
+
+import analysis
+from analysis import TECHNICAL_AREAS, merge_area_scores, score_sessions
+
+
+def _session(session_id, messages, interview_type="Technical"):
+    return {"session_id": session_id, "user_id": 7, "interview_type": interview_type, "messages": messages}
+
+
+def test_merge_area_scores_weights_and_orders_by_config():
+    merged = merge_area_scores([
+        (3, [{"name": "Communication", "score": 80}, {"name": "Algorithms / DSA", "score": 60}]),
+        (1, [{"name": "Communication", "score": 40}, {"name": "Unknown", "score": 100}]),
+        (0, [{"name": "System Design", "score": 90}]),
+    ], TECHNICAL_AREAS)
+    assert merged == [
+        {"name": "Algorithms / DSA", "score": 60},
+        {"name": "Communication", "score": 70},
+    ]
+
+
+def test_score_sessions_prefers_inline_and_skips_memoizing_ai_failures(monkeypatch):
+    ai_calls = []
+
+    def failing_chunk(qa_pairs, area_config):
+        ai_calls.append(len(qa_pairs))
+        return None, {"model": "gpt-4o", "prompt_tokens": 10, "cached_tokens": 0,
+                      "completion_tokens": 0, "latency_ms": 5}
+
+    monkeypatch.setattr(analysis, "_analyze_chunk", failing_chunk)
+    inline = _session(1, [
+        {"role": "assistant", "content": "Explain hashing."},
+        {"role": "user", "content": "A hash maps keys to buckets."},
+        {"role": "assistant", "content": "Ok.", "metadata": {"scores": [{"area": "Communication", "score": 75}]}},
+    ])
+    unscored = _session(2, [
+        {"role": "assistant", "content": "Explain binary search."},
+        {"role": "user", "content": "Halve the range each step."},
+    ])
+    usage_log = []
+    results, memoize = score_sessions([inline, unscored], usage_log)
+    assert results[1]["method"] == "inline"
+    assert results[2]["method"] == "keyword"
+    # Only the session that needed it went to the model, and its fallback is retried later
+    assert ai_calls == [1]
+    assert [score["session_id"] for score in memoize] == [1]
+    # The failed call still cost tokens, and is logged against its session
+    assert [(row["user_id"], row["session_id"], row["prompt_tokens"]) for row in usage_log] == [(7, 2, 10)]
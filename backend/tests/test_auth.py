@@ -0,0 +1,90 @@
+import datetime
+import time
+
+import pytest
+
+jwt = pytest.importorskip("jwt")
+
+from auth import SYNC_OVERLAP, AuthError, TokenAuth
+
+
+class FakeDB:
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.since_calls = []
+
+    def get_token_versions_since(self, since=None):
+        self.since_calls.append(since)
+        return self.rows
+
+
+def _at(seconds: int) -> datetime.datetime:
+    return datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc) + datetime.timedelta(seconds=seconds)
+
+
+def test_verified_tokens_are_served_from_the_lru(monkeypatch):
+    auth = TokenAuth(FakeDB(), "secret", cache_size=2)
+    tokens = [auth.issue(user_id, f"user{user_id}") for user_id in (1, 2, 3)]
+    for token in tokens:
+        auth.verify(token)
+    assert list(auth._verified) == tokens[1:]
+
+    def no_decode(*args, **kwargs):
+        raise AssertionError("cached token was decoded again")
+
+    monkeypatch.setattr(jwt, "decode", no_decode)
+    assert auth.verify(tokens[2])["user_id"] == 3
+
+
+def test_invalid_and_expired_tokens_are_rejected():
+    auth = TokenAuth(FakeDB(), "secret")
+    with pytest.raises(AuthError, match="Invalid"):
+        auth.verify(TokenAuth(FakeDB(), "other-secret").issue(1, "alice"))
+    token = auth.issue(1, "alice")
+    auth.verify(token)
+    auth._verified[token]["exp"] = time.time() - 1
+    with pytest.raises(AuthError, match="expired"):
+        auth.verify(token)
+
+
+def test_version_bump_revokes_older_tokens():
+    auth = TokenAuth(FakeDB(), "secret")
+    old = auth.issue(1, "alice", token_version=0)
+    auth.verify(old)
+    auth.note_version(1, 1)
+    with pytest.raises(AuthError, match="revoked"):
+        auth.verify(old)
+    assert auth.verify(auth.issue(1, "alice", token_version=1))["ver"] == 1
+
+
+def test_disabled_user_is_rejected_even_when_cached():
+    auth = TokenAuth(FakeDB(), "secret")
+    token = auth.issue(1, "alice")
+    auth.verify(token)
+    auth.disable_user(1)
+    with pytest.raises(AuthError, match="revoked"):
+        auth.verify(token)
+
+
+def test_sync_applies_other_processes_revocations():
+    db = FakeDB([
+        {"user_id": 1, "token_version": 2, "disabled": False, "token_version_updated_at": _at(10)},
+        # Purged account: tombstone with no users row left
+        {"user_id": 2, "token_version": 0, "disabled": True, "token_version_updated_at": _at(20)},
+    ])
+    auth = TokenAuth(db, "secret")
+    alice, bob = auth.issue(1, "alice", token_version=1), auth.issue(2, "bob")
+    auth.verify(alice)
+    auth.verify(bob)
+    auth.sync()
+    for token in (alice, bob):
+        with pytest.raises(AuthError, match="revoked"):
+            auth.verify(token)
+
+
+def test_sync_window_overlaps_the_last_seen_change():
+    db = FakeDB([{"user_id": 1, "token_version": 1, "disabled": False, "token_version_updated_at": _at(10)}])
+    auth = TokenAuth(db, "secret")
+    auth.sync()
+    auth.sync()
+    assert db.since_calls == [None, _at(10) - SYNC_OVERLAP]
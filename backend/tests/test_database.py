@@ -0,0 +1,184 @@
+from datetime import datetime, timezone
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("dotenv")
+
+import database
+from database import (
+    InterviewDatabase, ReadYourWritesMiddleware, WRITE_MARKER_HEADER, _UnitConnection, _merge_messages,
+    client_wrote_recently
+)
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 1
+
+    def execute(self, sql, params=None):
+        self.conn.statements.append(sql)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+        self.commits = self.rollbacks = 0
+        self.closed = False
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    opened = []
+
+    def connect(*args, **kwargs):
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    monkeypatch.setattr(database.psycopg2, "connect", connect)
+    monkeypatch.setattr(InterviewDatabase, "init_database", lambda self: None)
+    return opened
+
+
+def test_unit_defers_step_commits_and_closes_to_finish():
+    conn = FakeConnection()
+    unit = _UnitConnection(lambda: conn)
+    assert not unit.opened
+    unit.cursor().execute("INSERT 1")
+    unit.commit()
+    unit.close()
+    assert (conn.commits, conn.closed) == (0, False)
+    unit.finish()
+    assert (conn.commits, conn.rollbacks, conn.closed) == (1, 0, True)
+
+
+def test_step_rollback_dooms_the_unit():
+    conn = FakeConnection()
+    unit = _UnitConnection(lambda: conn)
+    unit.cursor().execute("INSERT 1")
+    unit.rollback()
+    # Later steps still run on the rolled-back connection, but nothing is committed
+    unit.cursor().execute("INSERT 2")
+    with pytest.raises(RuntimeError):
+        unit.finish()
+    assert (conn.commits, conn.rollbacks, conn.closed) == (0, 2, True)
+
+
+def test_abort_rolls_back_and_unused_units_never_connect():
+    conn = FakeConnection()
+    unit = _UnitConnection(lambda: conn)
+    unit.cursor()
+    unit.abort()
+    assert (conn.commits, conn.rollbacks, conn.closed) == (0, 1, True)
+
+    def connect():
+        raise AssertionError("an unused unit must not open a connection")
+
+    unused = _UnitConnection(connect)
+    unused.finish()
+    unused.abort()
+
+
+def test_unit_of_work_shares_one_connection_and_commits_once(connections):
+    db = InterviewDatabase(database_url="postgresql://test")
+    with db.unit_of_work() as uow:
+        uow.record_llm_usage(1, 2, "interview.chat", "gpt-4o", 10, 0, 5, 100)
+        uow.record_llm_usage(1, 2, "interview.chat", "gpt-4o", 12, 10, 6, 90)
+    [conn] = connections
+    assert len(conn.statements) == 2
+    assert (conn.commits, conn.closed) == (1, True)
+    # The database itself is untouched by the unit
+    assert db._unit is None
+
+
+def test_unit_of_work_rolls_back_when_the_block_raises(connections):
+    db = InterviewDatabase(database_url="postgresql://test")
+    with pytest.raises(ValueError):
+        with db.unit_of_work() as uow:
+            uow.record_llm_usage(1, 2, "interview.chat", "gpt-4o", 10, 0, 5, 100)
+            raise ValueError("handler failed")
+    [conn] = connections
+    assert (conn.commits, conn.rollbacks, conn.closed) == (0, 1, True)
+
+
+def test_merge_messages_dedupes_across_layouts_and_orders_by_time():
+    rows = [
+        {"role": "assistant", "content": "Q1", "timestamp": datetime(2026, 1, 1, 10, 0)},
+        {"role": "user", "content": "A1", "timestamp": datetime(2026, 1, 1, 10, 1, tzinfo=timezone.utc)},
+    ]
+    # The same messages as a transcript or archive stores them (ISO strings), plus a newer one
+    transcript = [
+        {"role": "user", "content": "A1", "timestamp": "2026-01-01T10:01:00+00:00"},
+        {"role": "assistant", "content": "Q2", "timestamp": "2026-01-01T10:02:00"},
+        {"role": "assistant", "content": "Q1", "timestamp": "2026-01-01T10:00:00+00:00"},
+    ]
+    merged = _merge_messages(transcript, rows)
+    assert [entry["content"] for entry in merged] == ["Q1", "A1", "Q2"]
+    # The first source's copy of a duplicate is kept
+    assert merged[0]["timestamp"] == "2026-01-01T10:00:00+00:00"
+
+
+def test_merge_messages_keeps_repeated_content_at_different_times():
+    merged = _merge_messages([
+        {"role": "user", "content": "Yes", "timestamp": "2026-01-01T10:05:00"},
+        {"role": "user", "content": "Yes", "timestamp": "2026-01-01T10:01:00"},
+        {"role": "assistant", "content": "Untimed"},
+    ])
+    assert [(entry["content"], entry.get("timestamp")) for entry in merged] == [
+        ("Untimed", None), ("Yes", "2026-01-01T10:01:00"), ("Yes", "2026-01-01T10:05:00"),
+    ]
+
+
+def _call_middleware(method, marker=None, status=200):
+    """Run one request through ReadYourWritesMiddleware; returns (client_wrote_recently seen, response headers)."""
+    seen, sent = [], []
+
+    async def app(scope, receive, send):
+        seen.append(client_wrote_recently.get())
+        await send({"type": "http.response.start", "status": status, "headers": []})
+
+    async def send(message):
+        sent.append(message)
+
+    headers = [(WRITE_MARKER_HEADER.lower().encode(), marker)] if marker is not None else []
+    asyncio.run(ReadYourWritesMiddleware(app)({"type": "http", "method": method, "headers": headers}, None, send))
+    return seen[0], dict(sent[0]["headers"])
+
+
+def test_recent_write_marker_sends_reads_to_the_primary():
+    assert _call_middleware("GET", f"{time.time() - 1:.3f}".encode())[0] is True
+    assert client_wrote_recently.get() is False
+
+
+@pytest.mark.parametrize("marker", [
+    None, b"", b"not-a-time", b"\xff", f"{time.time() - 3600:.3f}".encode(),
+    f"{time.time() + 3600:.3f}".encode(), b"nan",
+])
+def test_missing_stale_or_malformed_markers_are_ignored(marker):
+    assert _call_middleware("GET", marker)[0] is False
+
+
+def test_only_successful_writes_are_marked():
+    marker = WRITE_MARKER_HEADER.lower().encode()
+    before = time.time()
+    assert float(_call_middleware("POST")[1][marker]) >= before - 0.001
+    assert marker not in _call_middleware("GET")[1]
+    assert marker not in _call_middleware("DELETE", status=404)[1]
@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("dotenv")
+
+from analysis import TECHNICAL_AREAS, parse_scored_reply, score_session_inline
+
+
+def _session(session_id, messages, interview_type="Technical"):
+    return {"session_id": session_id, "user_id": 7, "interview_type": interview_type, "messages": messages}
+
+
+def test_parse_scored_reply_keeps_known_areas_and_clamps():
+    raw = """```json
+    {"reply": "Next question: design a rate limiter.",
+     "scores": [{"area": "System Design", "score": 130}, {"area": "Cooking", "score": 50},
+                {"area": "Communication", "score": "70"}, {"area": "Coding Quality"}],
+     "done": false}
+    ```"""
+    reply, metadata = parse_scored_reply(raw, TECHNICAL_AREAS)
+    assert reply == "Next question: design a rate limiter."
+    assert metadata == {
+        "scores": [{"area": "System Design", "score": 100}, {"area": "Communication", "score": 70}],
+        "done": False,
+    }
+
+
+def test_parse_scored_reply_falls_back_to_raw_text():
+    assert parse_scored_reply("Plain prose reply", TECHNICAL_AREAS) == ("Plain prose reply", None)
+    assert parse_scored_reply('{"scores": []}', TECHNICAL_AREAS) == ('{"scores": []}', None)
+
+
+def test_inline_scores_average_per_answer():
+    session = _session(1, [
+        {"role": "assistant", "content": "Tell me about a conflict.", "metadata": None},
+        {"role": "user", "content": "..."},
+        {"role": "assistant", "content": "Thanks.", "metadata": {"scores": [{"area": "Teamwork", "score": 60}]}},
+        {"role": "user", "content": "..."},
+        {"role": "assistant", "content": "Good.", "metadata": {"scores": [{"area": "Teamwork", "score": 80}]}},
+    ], interview_type="Behavioral")
+    score = score_session_inline(session)
+    assert score["method"] == "inline"
+    assert score["areas"] == [{"name": "Teamwork", "score": 70}]
+    assert score["qa_count"] == 2
+    assert score_session_inline(_session(2, [{"role": "user", "content": "hi"}])) is None
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+import profiling
+from profiling import ProfilingMiddleware, Span, _current_span, phase, profile_methods, profiled
+
+
+def _profile(fn):
+    """Run fn under a root span, as the middleware does, and return the finished root."""
+    root = Span("GET /test")
+    token = _current_span.set(root)
+    try:
+        fn()
+    finally:
+        _current_span.reset(token)
+        root.finish()
+    return root
+
+
+def test_phase_is_a_no_op_outside_a_profiled_request():
+    with phase("db.query"):
+        pass
+    assert _current_span.get() is None
+
+
+def test_phases_nest_and_totals_sum_repeated_names():
+    def handler():
+        with phase("db"):
+            with phase("db.query"):
+                pass
+            with phase("db.query"):
+                pass
+        with phase("openai.chat"):
+            pass
+
+    root = _profile(handler)
+    tree = root.to_dict()
+    assert tree["name"] == "GET /test"
+    assert [child["name"] for child in tree["children"]] == ["db", "openai.chat"]
+    assert [child["name"] for child in tree["children"][0]["children"]] == ["db.query", "db.query"]
+    totals = root.phase_totals()
+    assert set(totals) == {"db", "db.query", "openai.chat"}
+    queries = root.children[0].children
+    assert totals["db.query"] == pytest.approx(queries[0].duration_ms + queries[1].duration_ms, abs=0.002)
+    # The parent is restored once each phase ends
+    assert _current_span.get() is None
+
+
+def test_phase_finishes_its_span_when_the_block_raises():
+    def handler():
+        try:
+            with phase("failing"):
+                raise ValueError("boom")
+        except ValueError:
+            pass
+
+    root = _profile(handler)
+    assert root.children[0].duration_ms is not None
+
+
+def test_profile_methods_wraps_public_methods_only():
+    @profile_methods("db")
+    class Store:
+        def get(self):
+            return "row"
+
+        def _connect(self):
+            return "conn"
+
+        def rows(self):
+            yield "row"
+
+    store = Store()
+    root = _profile(lambda: (store.get(), store._connect(), list(store.rows())))
+    assert [child.name for child in root.children] == ["db.get"]
+
+
+def test_profiled_records_a_phase_and_returns_the_result():
+    @profiled("score_sessions")
+    def score():
+        return 42
+
+    results = []
+    root = _profile(lambda: results.append(score()))
+    assert results == [42]
+    assert [child.name for child in root.children] == ["score_sessions"]
+
+
+def test_middleware_records_slow_requests_with_status_and_phases(monkeypatch):
+    monkeypatch.setattr(profiling, "SLOW_REQUEST_MS", 0)
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 0)
+    monkeypatch.setattr(profiling, "recent_profiles", profiling.deque(maxlen=5))
+
+    async def app(scope, receive, send):
+        with phase("db.get_user"):
+            pass
+        await send({"type": "http.response.start", "status": 201, "headers": []})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(ProfilingMiddleware(app)({"type": "http", "method": "POST", "path": "/x"}, None, send))
+    assert sent[0]["status"] == 201
+    [profile] = profiling.recent_profiles
+    assert profile["request"] == "POST /x"
+    assert profile["status"] == 201
+    assert profile["reason"] == "slow"
+    assert list(profile["phases"]) == ["db.get_user"]
@@ -0,0 +1,64 @@
+from resume_utils import CHARS_PER_TOKEN, build_digest
+
+RESUME = """Jane Doe
+jane@example.com
+
+SUMMARY
+Backend engineer with eight years building payment and data platforms.
+
+SKILLS
+Python, Go, PostgreSQL, Kafka, Kubernetes
+
+EXPERIENCE
+Senior Engineer, Acme Pay 2019 - Present
+- Cut settlement latency by 40% by moving reconciliation to streaming jobs
+- Led a team of 5 engineers across two time zones
+- Attended weekly meetings
+Engineer, Databox 2015 - 2019
+- Built a query cache serving 12k requests per second
+- Wrote documentation
+
+PROJECTS
+- Open-source Postgres extension for time-bucketed rollups with 2,000 GitHub stars
+""" + "\n".join(f"- Maintained internal tool number {i} for the operations team" for i in range(200))
+
+
+def test_short_text_is_returned_whole():
+    text = "SKILLS\nPython, Go"
+    assert build_digest(text, 600) == text
+
+
+def test_digest_stays_within_budget():
+    for max_tokens in (60, 120, 300):
+        assert len(build_digest(RESUME, max_tokens)) <= max_tokens * CHARS_PER_TOKEN
+
+
+def test_core_facts_come_first():
+    digest = build_digest(RESUME, 150)
+    assert digest.startswith("Sections: Summary, Skills, Experience, Projects")
+    assert "Skills: Python, Go, PostgreSQL, Kafka, Kubernetes" in digest
+    assert "- Senior Engineer, Acme Pay 2019 - Present" in digest
+
+
+def test_budget_is_filled_with_ranked_bullets():
+    digest = build_digest(RESUME, 150)
+    assert "Highlights:" in digest
+    # Bullets with numbers outrank filler lines
+    assert "Cut settlement latency by 40%" in digest
+    assert "Attended weekly meetings" not in digest
+    # Whatever the core leaves free is used, not dropped
+    assert len(digest) > 150 * CHARS_PER_TOKEN * 0.8
+
+
+def test_repeated_lines_appear_once():
+    doubled = RESUME + "\n\nEXPERIENCE\n- Cut settlement latency by 40% by moving reconciliation to streaming jobs"
+    digest = build_digest(doubled, 300)
+    assert digest.count("Cut settlement latency") == 1
+
+
+def test_long_skill_lists_are_capped_and_deduped_case_insensitively():
+    skills = ", ".join(f"Tool{i}, tool{i}" for i in range(5000))
+    digest = build_digest("SKILLS\n" + skills, 100)
+    assert len(digest) <= 100 * CHARS_PER_TOKEN
+    assert "Tool0, Tool1," in digest
+    assert "tool0" not in digest
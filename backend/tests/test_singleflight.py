@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import KeyReuseError, SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    calls, release = [], threading.Event()
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do("k", work))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert calls == [1]
+    assert results == ["result"] * 5
+
+
+def test_errors_are_shared_but_not_cached():
+    flights = SingleFlight(ttl_seconds=60)
+    with pytest.raises(ValueError):
+        flights.do("k", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert flights.do("k", lambda: "retried") == "retried"
+
+
+def test_results_replay_until_ttl_expires():
+    flights = SingleFlight(ttl_seconds=0.05)
+    assert flights.do("k", lambda: 1) == 1
+    assert flights.do("k", lambda: 2) == 1
+    time.sleep(0.06)
+    assert flights.do("k", lambda: 3) == 3
+
+
+def test_uncached_calls_do_not_replay():
+    flights = SingleFlight(ttl_seconds=60)
+    assert flights.do("k", lambda: 1, cache=False) == 1
+    assert flights.do("k", lambda: 2, cache=False) == 2
+
+
+def test_forget_drops_cached_result():
+    flights = SingleFlight(ttl_seconds=60)
+    flights.do("k", lambda: 1)
+    flights.forget("k")
+    assert flights.do("k", lambda: 2) == 2
+
+
+def test_cache_is_bounded():
+    flights = SingleFlight(ttl_seconds=60, max_entries=2)
+    for key in ("a", "b", "c"):
+        flights.do(key, lambda: key)
+    assert flights.do("a", lambda: "recomputed") == "recomputed"
+    assert flights.do("c", lambda: "recomputed") == "c"
+
+
+def test_key_reused_with_other_fingerprint_is_rejected():
+    flights = SingleFlight(ttl_seconds=60)
+    assert flights.do("k", lambda: 1, fingerprint="body-a") == 1
+    assert flights.do("k", lambda: 2, fingerprint="body-a") == 1
+    with pytest.raises(KeyReuseError):
+        flights.do("k", lambda: 3, fingerprint="body-b")
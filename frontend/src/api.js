@@ -6,9 +6,18 @@ const API = axios.create({ baseURL: "http://localhost:8000" });
 API.interceptors.request.use((config) => {
   const token = localStorage.getItem("token");
   if (token) config.headers.Authorization = `Bearer ${token}`;
+  // Echo our last write's time so reads right after it skip lagging replicas
+  const lastWrite = localStorage.getItem("lastWrite");
+  if (lastWrite) config.headers["X-Last-Write"] = lastWrite;
   return config;
 });
 
+API.interceptors.response.use((response) => {
+  const lastWrite = response.headers["x-last-write"];
+  if (lastWrite) localStorage.setItem("lastWrite", lastWrite);
+  return response;
+});
+
 // ─── Auth ──────────────────────────────────────────────────────────────────────
 export const login = (username, password) =>
   API.post("/auth/login", { username, password });
@@ -49,6 +58,7 @@ export const sendMessage = (
     num_questions,
     resume_text,
     job_description,
+    inline_scoring: true,
   });
 
 export const updateSessionStatus = (session_id, status) =>
@@ -73,6 +83,9 @@ export const getSessionDetails = (session_id) =>
 
 export const getStats = () => API.get("/history/stats");
 
+export const searchHistory = (q, page = 1) =>
+  API.get("/history/search", { params: { q, page } });
+
 export const getDashboardInsights = () => API.get("/history/dashboard");
 
 // ─── Resumes ───────────────────────────────────────────────────────────────────
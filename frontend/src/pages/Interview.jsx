@@ -204,16 +204,10 @@ export default function Interview() {
     setInput("");
     setLoading(true);
     try {
-      const allMessages = [
-        {
-          role: "system",
-          content: `You are an expert technical interviewer conducting a ${sessionConfig.difficulty} ${sessionConfig.interviewType} interview. Ask one question at a time and give a final evaluation after ${sessionConfig.numQuestions} questions.`,
-        },
-        ...updated,
-      ];
+      // The server prepends the session's system prompt
       const res = await sendMessage(
         sessionId,
-        allMessages,
+        updated,
         sessionConfig.interviewType,
         sessionConfig.difficulty,
         sessionConfig.numQuestions,
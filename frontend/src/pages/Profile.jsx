@@ -266,7 +266,8 @@ export default function Profile() {
     if (newPassword !== confirmNewPassword) return showMsg("error", "New passwords do not match");
     setSaving(true);
     try {
-      await updatePassword(currentPassword, newPassword);
+      const res = await updatePassword(currentPassword, newPassword);
+      localStorage.setItem("token", res.data.token);
       setCurrentPassword(""); setNewPassword(""); setConfirmNewPassword("");
       setActiveSection(null);
       showMsg("success", "Password updated!");